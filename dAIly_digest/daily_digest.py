@@ -8,26 +8,65 @@ Wysyła spersonalizowane podsumowanie dnia na email o 7:45
 import os
 import sys
 import json
+import argparse
+import bisect
+import re
 import random
+import hashlib
+import importlib
+import html
+import queue
+import signal
+import sqlite3
+from array import array
+from collections import Counter, OrderedDict
+from contextlib import contextmanager, nullcontext
 import smtplib
+import subprocess
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from email import charset as email_charset
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from email.utils import formataddr
+from email.utils import formataddr, parsedate_to_datetime
+from urllib.parse import urlsplit
 import time
-from typing import Dict, List, Optional, Any
-
-# Importy dla integracji z zewnętrznymi usługami
-import requests
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-import openai
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Any, Callable, Tuple, Iterable, Iterator
+
 from dotenv import load_dotenv
 
+
+class LazyModule:
+    """Moduł importowany dopiero przy pierwszym użyciu atrybutu.
+
+    Ciężkie biblioteki (openai, klient Google API) nie spowalniają startu skryptu, jeśli dane
+    uruchomienie z nich nie korzysta.
+    """
+    
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+    
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+    
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+
+# Importy dla integracji z zewnętrznymi usługami (ładowane przy pierwszym użyciu)
+requests = LazyModule('requests')
+openai = LazyModule('openai')
+LAZY_IMPORTS = ('requests', 'openai', 'google.oauth2.credentials', 'google.auth.transport.requests',
+                'google_auth_oauthlib.flow', 'googleapiclient.discovery')
+
 # Załaduj zmienne środowiskowe
 load_dotenv()
 
@@ -44,8 +83,81 @@ logger = logging.getLogger(__name__)
 
 # Stałe konfiguracyjne
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+# Okrojony dokument discovery (tylko calendarList.list, calendars.get, events.list) - bez parsowania pełnego
+CALENDAR_DISCOVERY_PATH = os.getenv('CALENDAR_DISCOVERY_PATH',
+                                    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calendar_discovery.json'))
 MAX_RETRIES = 3
-RETRY_DELAY = 2  # sekundy
+RETRY_DELAY = 2  # sekundy (podstawa backoffu wykładniczego)
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '30'))  # sekundy
+CIRCUIT_BREAKER_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_THRESHOLD', '5'))  # kolejne błędy do otwarcia
+CIRCUIT_BREAKER_COOLDOWN = float(os.getenv('CIRCUIT_BREAKER_COOLDOWN', '300'))  # sekundy
+FETCH_DEADLINE = float(os.getenv('DIGEST_FETCH_DEADLINE', '60'))  # sekundy na pobranie wszystkich źródeł
+# Ostatnie poprawne dane źródeł: po SNAPSHOT_STALE_AFTER sekundach wolne źródło jest podawane z kopii
+SNAPSHOTS_ENABLED = os.getenv('DIGEST_SNAPSHOTS', 'true').lower() in ('1', 'true', 'yes')
+SNAPSHOT_STALE_AFTER = float(os.getenv('SNAPSHOT_STALE_AFTER', '15'))
+SNAPSHOT_MAX_AGE = int(os.getenv('SNAPSHOT_MAX_AGE', str(7 * 86400)))  # sekundy
+DEFAULT_LANGUAGE = 'pl'
+BATCH_WORKERS = int(os.getenv('DIGEST_BATCH_WORKERS', '8'))
+# Tryb demona: domyślna godzina wysyłki, wyprzedzenie przygotowania i odświeżenie kalendarza przed wysyłką
+DEFAULT_SEND_TIME = os.getenv('DIGEST_SEND_TIME', '07:45')
+DAEMON_LEAD_MINUTES = float(os.getenv('DIGEST_LEAD_MINUTES', '10'))
+DAEMON_REFRESH_SECONDS = float(os.getenv('DIGEST_REFRESH_SECONDS', '60'))
+# Eksport metryk uruchomienia: plik tekstowy Prometheus (node_exporter textfile collector) i/lub raport JSON
+METRICS_TEXTFILE = os.getenv('METRICS_TEXTFILE', '')
+METRICS_JSON = os.getenv('METRICS_JSON', '')
+SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'true').lower() in ('1', 'true', 'yes')
+SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '3'))
+# Kompaktowy HTML: powtarzające się style inline zamieniane na klasy w bloku <style>
+EMAIL_COMPACT_HTML = os.getenv('EMAIL_COMPACT_HTML', 'false').lower() in ('1', 'true', 'yes')
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '10'))  # sekundy
+CACHE_DIR = os.getenv('DIGEST_CACHE_DIR', '.cache')
+WEATHER_CACHE_TTL = int(os.getenv('WEATHER_CACHE_TTL', '10800'))  # sekundy (3h)
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv('WEATHER_CACHE_MAX_ENTRIES', '100'))
+WEATHER_WEEK_AHEAD = os.getenv('WEATHER_WEEK_AHEAD', 'false').lower() in ('1', 'true', 'yes')
+WEEKDAY_NAMES = ('pon', 'wt', 'śr', 'czw', 'pt', 'sob', 'nd')
+CALENDAR_METADATA_TTL = int(os.getenv('GOOGLE_CALENDAR_METADATA_TTL', '604800'))  # sekundy (7 dni)
+CALENDAR_BATCH_SIZE = 50  # limit zapytań w jednym batchu Google Calendar API
+CALENDAR_SYNC_MODE = os.getenv('GOOGLE_CALENDAR_SYNC_MODE', 'full').lower()  # 'full' lub 'incremental'
+CALENDAR_SYNC_STATE_TTL = int(os.getenv('GOOGLE_CALENDAR_SYNC_STATE_TTL', '604800'))  # sekundy (7 dni)
+CALENDAR_SYNC_HORIZON_DAYS = int(os.getenv('GOOGLE_CALENDAR_SYNC_HORIZON_DAYS', '7'))  # zasięg pełnej synchronizacji
+NOTION_RATE_LIMIT = float(os.getenv('NOTION_RATE_LIMIT', '3'))  # zapytania na sekundę (limit Notion API)
+NOTION_UPDATE_WORKERS = int(os.getenv('NOTION_UPDATE_WORKERS', '3'))
+NOTION_PAGE_SIZE = min(int(os.getenv('NOTION_PAGE_SIZE', '100')), 100)  # Notion API przyjmuje maksymalnie 100
+NOTION_FILTER_PROPERTIES = [
+    name.strip() for name in os.getenv('NOTION_FILTER_PROPERTIES', 'Name,Link,Author').split(',') if name.strip()
+]
+NOTION_SCHEMA_TTL = int(os.getenv('NOTION_SCHEMA_TTL', '86400'))  # sekundy (1 dzień)
+NOTION_INDEX_PATH = os.getenv('NOTION_INDEX_PATH', '')  # pusta wartość wyłącza lokalny indeks
+NOTION_INDEX_FULL_RESYNC = int(os.getenv('NOTION_INDEX_FULL_RESYNC', '604800'))  # sekundy (7 dni)
+ARTICLES_PER_DIGEST = 3
+QUOTES_FILE = os.getenv('QUOTES_FILE', 'quotes.json')
+QUOTE_POOL_PATH = os.getenv('QUOTE_POOL_PATH', 'quote_pool.json')
+QUOTE_POOL_BATCH_SIZE = int(os.getenv('QUOTE_POOL_BATCH_SIZE', '20'))
+QUOTE_POOL_MIN_SIZE = int(os.getenv('QUOTE_POOL_MIN_SIZE', '5'))
+AI_COMBINED_MODE = os.getenv('AI_COMBINED_MODE', 'false').lower() in ('1', 'true', 'yes')
+AI_BATCH_API = os.getenv('AI_BATCH_API', 'false').lower() in ('1', 'true', 'yes')
+AI_BATCH_POLL_INTERVAL = float(os.getenv('AI_BATCH_POLL_INTERVAL', '10'))  # sekundy
+AI_BATCH_TIMEOUT = float(os.getenv('AI_BATCH_TIMEOUT', '900'))  # sekundy oczekiwania na wyniki zadania
+AI_STREAMING = os.getenv('AI_STREAMING', 'false').lower() in ('1', 'true', 'yes')
+AI_LATENCY_BUDGET = float(os.getenv('AI_LATENCY_BUDGET', '15'))  # sekundy na wygenerowanie wprowadzenia
+AI_FALLBACK_INTRO = "Przepraszam, nie udało się wygenerować spersonalizowanej treści. Oto Twoje dane na dziś."
+AI_CACHE_BACKEND = os.getenv('AI_CACHE_BACKEND', 'memory').lower()  # memory, disk lub off
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', '86400'))  # sekundy (1 dzień)
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', '500'))
+QUOTE_POOL_HISTORY_SIZE = 5000  # ile odcisków wydanych cytatów pamiętać, aby się nie powtarzały
+
+# Nazwy języków w formie używanej w promptach ("w języku ...")
+LANGUAGE_NAMES = {
+    'pl': 'polskim',
+    'en': 'angielskim',
+    'de': 'niemieckim',
+    'fr': 'francuskim',
+    'es': 'hiszpańskim',
+    'it': 'włoskim'
+}
 
 
 class DailyDigestError(Exception):
@@ -53,52 +165,678 @@ class DailyDigestError(Exception):
     pass
 
 
+class SourceUnavailableError(DailyDigestError):
+    """Integracja zwróciła pusty wynik po błędzie, który zapisała już na swojej liście errors"""
+    pass
+
+
+class RunMetrics:
+    """Pomiary jednego uruchomienia: czasy etapów i wywołań API (spany) oraz liczniki.
+
+    Spany są agregowane po nazwie i etykietach (liczba, suma i maksimum czasu), liczniki sumowane.
+    Wynik można zapisać jako plik tekstowy Prometheus lub raport JSON.
+    """
+    
+    PREFIX = 'daily_digest'
+    
+    def __init__(self):
+        self.started_at = time.time()
+        self._start = time.monotonic()
+        self._spans: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Dict[str, float]] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _labels(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+    
+    @contextmanager
+    def span(self, name: str, **labels):
+        """Mierzy czas bloku kodu (np. `with metrics.span('stage', stage='weather'):`)"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record_span(name, time.monotonic() - start, **labels)
+    
+    def record_span(self, name: str, seconds: float, **labels):
+        key = (name, self._labels(labels))
+        with self._lock:
+            span = self._spans.setdefault(key, {'count': 0, 'sum': 0.0, 'max': 0.0})
+            span['count'] += 1
+            span['sum'] += seconds
+            span['max'] = max(span['max'], seconds)
+    
+    def incr(self, name: str, value: float = 1, **labels):
+        """Zwiększa licznik (nazwy zakończone _total, np. retries_total)"""
+        key = (name, self._labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def _cache_counters(self) -> Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]:
+        """Trafienia i chybienia wszystkich cache (liczone przez same cache)"""
+        counters = {}
+        with _disk_caches_lock:
+            caches = dict(_disk_caches)
+        completion_cache = get_completion_cache()
+        if completion_cache is not None and AI_CACHE_BACKEND != 'disk':
+            caches['ai_completions'] = completion_cache
+        for name, cache in caches.items():
+            cache_stats = cache.stats()
+            counters[('cache_hits_total', (('cache', name),))] = cache_stats['hits']
+            counters[('cache_misses_total', (('cache', name),))] = cache_stats['misses']
+        return counters
+    
+    def report(self, success: Optional[bool] = None) -> Dict[str, Any]:
+        """Raport uruchomienia w formie słownika (format raportu JSON)"""
+        with self._lock:
+            spans = {key: dict(value) for key, value in self._spans.items()}
+            counters = dict(self._counters)
+        counters.update(self._cache_counters())
+        return {
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'duration_seconds': round(time.monotonic() - self._start, 3),
+            'success': success,
+            'spans': [
+                {'name': name, 'labels': dict(labels), 'count': value['count'],
+                 'total_seconds': round(value['sum'], 4), 'max_seconds': round(value['max'], 4)}
+                for (name, labels), value in sorted(spans.items(), key=lambda item: -item[1]['sum'])
+            ],
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(counters.items())
+            ]
+        }
+    
+    def to_prometheus(self, success: Optional[bool] = None) -> str:
+        """Raport w formacie tekstowym Prometheus"""
+        def _format_labels(labels: Dict[str, str]) -> str:
+            if not labels:
+                return ''
+            escaped = (
+                key + '="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+                for key, value in labels.items()
+            )
+            return '{' + ','.join(escaped) + '}'
+        
+        report = self.report(success)
+        families: Dict[str, Tuple[str, List[str]]] = {}
+        
+        def _add(family: str, metric_type: str, labels: Dict[str, str], value: float, suffix: str = ''):
+            # Liczby całkowite (np. znacznik czasu) bez notacji wykładniczej
+            formatted = str(int(value)) if float(value).is_integer() else repr(round(float(value), 6))
+            families.setdefault(family, (metric_type, []))[1].append(
+                f"{family}{suffix}{_format_labels(labels)} {formatted}"
+            )
+        
+        for span in report['spans']:
+            family = f"{self.PREFIX}_{span['name']}_duration_seconds"
+            _add(family, 'summary', span['labels'], span['total_seconds'], '_sum')
+            _add(family, 'summary', span['labels'], span['count'], '_count')
+            _add(f"{self.PREFIX}_{span['name']}_max_duration_seconds", 'gauge', span['labels'], span['max_seconds'])
+        for counter in report['counters']:
+            _add(f"{self.PREFIX}_{counter['name']}", 'counter', counter['labels'], counter['value'])
+        _add(f"{self.PREFIX}_run_duration_seconds", 'gauge', {}, report['duration_seconds'])
+        _add(f"{self.PREFIX}_last_run_timestamp_seconds", 'gauge', {}, round(self.started_at))
+        if success is not None:
+            _add(f"{self.PREFIX}_last_run_success", 'gauge', {}, int(success))
+        
+        lines = []
+        for metric, (metric_type, samples) in families.items():
+            lines.append(f"# TYPE {metric} {metric_type}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+    
+    def export(self, success: Optional[bool] = None, textfile: str = METRICS_TEXTFILE,
+               json_path: str = METRICS_JSON) -> None:
+        """Zapisuje metryki do skonfigurowanych plików (atomowo - zapis do pliku tymczasowego i zamiana)"""
+        outputs = []
+        if textfile:
+            outputs.append((textfile, self.to_prometheus(success)))
+        if json_path:
+            outputs.append((json_path, json.dumps(self.report(success), ensure_ascii=False, indent=2)))
+        for path, data in outputs:
+            try:
+                directory = os.path.dirname(os.path.abspath(path))
+                os.makedirs(directory, exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Nie udało się zapisać metryk do {path}: {e}")
+    
+    def log_summary(self, top: int = 8) -> None:
+        """Loguje etapy, które zajęły najwięcej czasu"""
+        stages = [span for span in self.report()['spans'] if span['name'] == 'stage'][:top]
+        if stages:
+            logger.info("Czas etapów: " + ', '.join(
+                f"{span['labels'].get('stage')} {span['total_seconds']:.2f}s" for span in stages
+            ))
+
+
+_run_metrics = RunMetrics()
+
+
+def get_run_metrics() -> RunMetrics:
+    """Zwraca metryki bieżącego uruchomienia"""
+    return _run_metrics
+
+
+def reset_run_metrics() -> RunMetrics:
+    """Rozpoczyna nowy zestaw metryk (np. dla kolejnego cyklu demona)"""
+    global _run_metrics
+    _run_metrics = RunMetrics()
+    return _run_metrics
+
+
+def finish_run_metrics(success: bool) -> None:
+    """Loguje podsumowanie i eksportuje metryki zakończonego uruchomienia"""
+    metrics = get_run_metrics()
+    metrics.log_summary()
+    metrics.export(success)
+
+
+class HTTPSession:
+    """Współdzielona sesja HTTP z pulą połączeń keep-alive dla integracji REST"""
+    
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE, timeout: float = HTTP_TIMEOUT):
+        self.timeout = timeout
+        from requests.adapters import HTTPAdapter
+        
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+    
+    def request(self, method: str, url: str, **kwargs) -> 'requests.Response':
+        """Wykonuje zapytanie HTTP na połączeniu z puli (z domyślnym limitem czasu)"""
+        kwargs.setdefault('timeout', self.timeout)
+        metrics = get_run_metrics()
+        host = urlsplit(url).hostname or 'unknown'
+        with metrics.span('api_call', host=host):
+            response = self.session.request(method, url, **kwargs)
+        metrics.incr('http_requests_total', host=host, status=response.status_code)
+        metrics.incr('http_bytes_total', len(response.content), host=host, direction='received')
+        if response.request.body:
+            metrics.incr('http_bytes_total', len(response.request.body), host=host, direction='sent')
+        return response
+    
+    def get(self, url: str, **kwargs) -> 'requests.Response':
+        """Wykonuje zapytanie GET"""
+        return self.request('GET', url, **kwargs)
+    
+    def post(self, url: str, **kwargs) -> 'requests.Response':
+        """Wykonuje zapytanie POST"""
+        return self.request('POST', url, **kwargs)
+    
+    def patch(self, url: str, **kwargs) -> 'requests.Response':
+        """Wykonuje zapytanie PATCH"""
+        return self.request('PATCH', url, **kwargs)
+    
+    def connection_stats(self) -> Dict[str, Dict[str, int]]:
+        """Zwraca statystyki ponownego użycia połączeń dla każdego hosta"""
+        stats = {}
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host_stats = stats.setdefault(f"{pool.host}:{pool.port}", {'requests': 0, 'connections': 0, 'reused': 0})
+            host_stats['requests'] += pool.num_requests
+            host_stats['connections'] += pool.num_connections
+            host_stats['reused'] += max(pool.num_requests - pool.num_connections, 0)
+        return stats
+    
+    def log_stats(self) -> None:
+        """Loguje statystyki połączeń HTTP"""
+        for host, host_stats in self.connection_stats().items():
+            logger.info(
+                f"HTTP {host}: {host_stats['requests']} zapytań, {host_stats['connections']} połączeń, "
+                f"{host_stats['reused']} ponownie użytych"
+            )
+
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> HTTPSession:
+    """Zwraca współdzieloną sesję HTTP (tworzoną przy pierwszym użyciu)"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = HTTPSession()
+        return _http_session
+
+
+class DiskCache:
+    """Trwały cache wartości JSON na dysku z czasem ważności (TTL) i limitem liczby wpisów.
+
+    Każdy wpis to osobny plik nazwany skrótem klucza. Odczyt odświeża czas modyfikacji pliku,
+    więc po przekroczeniu limitu usuwane są najdawniej używane wpisy. Wpis po czasie ważności
+    zostaje na dysku (do wyparcia przez limit) jako dane awaryjne dostępne przez `get_stale`.
+    """
+    
+    def __init__(self, directory: str, ttl: float, max_entries: int = 100):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def _path(self, key: str) -> str:
+        """Zwraca ścieżkę pliku dla klucza"""
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Zwraca wartość z cache lub None, jeśli jej brak albo wygasła"""
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+            
+            if time.time() - entry.get('stored_at', 0) > self.ttl:
+                self.misses += 1
+                return None
+            
+            self.hits += 1
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return entry.get('value')
+    
+    def get_stale(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Zwraca (wartość, czas zapisu) niezależnie od TTL lub None, jeśli wpisu nie ma"""
+        with self._lock:
+            try:
+                with open(self._path(key), 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return None
+        return entry.get('value'), entry.get('stored_at', 0)
+    
+    def set(self, key: str, value: Any) -> None:
+        """Zapisuje wartość w cache (atomowo) i usuwa nadmiarowe wpisy"""
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'key': key, 'stored_at': time.time(), 'value': value}, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+                self._evict()
+            except OSError as e:
+                logger.warning(f"Nie udało się zapisać wpisu w cache {self.directory}: {e}")
+    
+    def _evict(self) -> None:
+        """Usuwa najdawniej używane wpisy ponad limit"""
+        entries = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.json')]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry_path: os.path.getmtime(entry_path))
+        for entry_path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+    
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca liczniki trafień i chybień"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0
+            }
+
+
+class MemoryCache:
+    """Cache w pamięci procesu z czasem ważności (TTL) i usuwaniem najdawniej używanych wpisów (LRU).
+
+    Ma ten sam interfejs co DiskCache, więc oba mogą służyć jako wymienny backend.
+    """
+    
+    def __init__(self, ttl: float, max_entries: int = 100):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Zwraca wartość z cache lub None, jeśli jej brak albo wygasła"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def set(self, key: str, value: Any) -> None:
+        """Zapisuje wartość w cache i usuwa nadmiarowe wpisy"""
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca liczniki trafień i chybień"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0
+            }
+
+
+_disk_caches: Dict[str, DiskCache] = {}
+_disk_caches_lock = threading.Lock()
+
+
+def get_disk_cache(name: str, ttl: float, max_entries: int = 100) -> DiskCache:
+    """Zwraca współdzielony cache o danej nazwie (tworzony przy pierwszym użyciu)"""
+    with _disk_caches_lock:
+        if name not in _disk_caches:
+            _disk_caches[name] = DiskCache(os.path.join(CACHE_DIR, name), ttl, max_entries)
+        return _disk_caches[name]
+
+
+def parse_retry_after(response: 'requests.Response', default: float = 1.0) -> float:
+    """Zwraca liczbę sekund z nagłówka Retry-After (liczba sekund lub data HTTP)"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+def reservoir_sample(items: Iterable[Any], k: int) -> List[Any]:
+    """Losuje k elementów z dowolnie długiego strumienia bez trzymania go w pamięci (algorytm R)"""
+    reservoir = []
+    for index, item in enumerate(items):
+        if index < k:
+            reservoir.append(item)
+        else:
+            replace_index = random.randint(0, index)
+            if replace_index < k:
+                reservoir[replace_index] = item
+    random.shuffle(reservoir)
+    return reservoir
+
+
+class TokenBucket:
+    """Kubełek tokenów ograniczający liczbę zapytań na sekundę (bezpieczny wątkowo)"""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        """Czeka, aż będzie dostępny token"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if now < self._paused_until:
+                    wait_time = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+    
+    def pause(self, seconds: float) -> None:
+        """Wstrzymuje wydawanie tokenów (np. po odpowiedzi 429 z Retry-After)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+
+_rate_limiters: Dict[str, TokenBucket] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, rate: float) -> TokenBucket:
+    """Zwraca współdzielony limiter zapytań (np. jeden dla tokenu Notion, wspólny dla wszystkich użytkowników)"""
+    with _rate_limiters_lock:
+        if name not in _rate_limiters:
+            _rate_limiters[name] = TokenBucket(rate)
+        return _rate_limiters[name]
+
+
+class RetryPolicy:
+    """Klasyfikuje błędy jako przejściowe lub trwałe i wylicza opóźnienie kolejnej próby.
+
+    Odpowiedzi 4xx (poza 408, 425 i 429) oraz błędy programistyczne nie są ponawiane. Opóźnienie rośnie
+    wykładniczo z losowym rozrzutem (jitter), a nagłówek Retry-After ma pierwszeństwo.
+    """
+    
+    RETRYABLE_CLIENT_STATUSES = (408, 425, 429)
+    NON_RETRYABLE_EXCEPTIONS = (KeyError, TypeError, AttributeError, IndexError, FileNotFoundError, PermissionError)
+    
+    def __init__(self, max_attempts: int = MAX_RETRIES, base_delay: float = RETRY_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY):
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+    
+    @staticmethod
+    def status_code(error: Exception) -> Optional[int]:
+        """Kod HTTP z wyjątku requests, Google API lub OpenAI (None, jeśli błąd nie pochodzi z odpowiedzi)"""
+        response = getattr(error, 'response', None)
+        if isinstance(response, requests.Response):
+            return response.status_code
+        # HttpError klienta Google API (bez importowania googleapiclient)
+        google_status = getattr(getattr(error, 'resp', None), 'status', None)
+        if google_status is not None:
+            return int(google_status)
+        return getattr(error, 'status_code', None)
+    
+    def is_retryable(self, error: Exception) -> bool:
+        """Czy ponowienie ma szansę powodzenia"""
+        status = self.status_code(error)
+        if status is not None:
+            return status >= 500 or status in self.RETRYABLE_CLIENT_STATUSES
+        return not isinstance(error, self.NON_RETRYABLE_EXCEPTIONS)
+    
+    def delay(self, attempt: int, error: Exception) -> float:
+        """Opóźnienie przed kolejną próbą (attempt liczone od 0)"""
+        response = getattr(error, 'response', None)
+        if isinstance(response, requests.Response) and response.headers.get('Retry-After'):
+            return min(parse_retry_after(response), self.max_delay)
+        # "Equal jitter": połowa opóźnienia stała, połowa losowa - klienci nie ponawiają w tej samej chwili
+        backoff = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+class CircuitBreaker:
+    """Bezpiecznik dla jednego dostawcy API, współdzielony przez wszystkich użytkowników w procesie.
+
+    Po `threshold` kolejnych przejściowych błędach wywołania są odrzucane od razu. Po `cooldown` sekundach
+    przepuszczana jest jedna próba - jej sukces zamyka bezpiecznik, porażka otwiera go na kolejny okres.
+    """
+    
+    def __init__(self, name: str, threshold: int = CIRCUIT_BREAKER_THRESHOLD,
+                 cooldown: float = CIRCUIT_BREAKER_COOLDOWN):
+        self.name = name
+        self.threshold = max(threshold, 1)
+        self.cooldown = cooldown
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+    
+    def allow(self) -> bool:
+        """Czy wywołanie może zostać wykonane"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                # Próba kontrolna - pozostałe wywołania czekają na jej wynik przez kolejny okres
+                self._opened_at = time.monotonic()
+                return True
+            self.rejected += 1
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"{self.name} - usługa znów odpowiada, bezpiecznik zamknięty")
+            self.failures = 0
+            self._opened_at = None
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self._opened_at is None:
+                    logger.warning(f"{self.name} - {self.failures} kolejnych błędów, bezpiecznik otwarty "
+                                   f"na {self.cooldown:.0f}s")
+                self._opened_at = time.monotonic()
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Zwraca współdzielony bezpiecznik dostawcy (wspólny dla wszystkich odbiorców w trybie wsadowym)"""
+    with _circuit_breakers_lock:
+        if name not in _circuit_breakers:
+            _circuit_breakers[name] = CircuitBreaker(name)
+        return _circuit_breakers[name]
+
+
 class APIIntegration:
     """Klasa do zarządzania integracjami z zewnętrznymi API"""
     
+    retry_policy = RetryPolicy()
+    
     def __init__(self):
         self.errors = []
+        self.http = get_http_session()
     
     def retry_operation(self, operation_name: str, operation_func, *args, **kwargs):
-        """Wykonuje operację z mechanizmem retry"""
-        for attempt in range(MAX_RETRIES):
+        """Wykonuje operację z mechanizmem retry (backoff z jitterem i bezpiecznikiem dostawcy)"""
+        breaker = get_circuit_breaker(operation_name)
+        policy = self.retry_policy
+        for attempt in range(policy.max_attempts):
+            if not breaker.allow():
+                get_run_metrics().incr('circuit_breaker_rejections_total', provider=operation_name)
+                error_msg = f"{operation_name} - usługa niedostępna po serii błędów, zapytanie pominięte"
+                self.errors.append(error_msg)
+                logger.error(error_msg)
+                return None
             try:
                 result = operation_func(*args, **kwargs)
+                breaker.record_success()
                 logger.info(f"{operation_name} - sukces w próbie {attempt + 1}")
                 return result
             except Exception as e:
                 logger.warning(f"{operation_name} - błąd w próbie {attempt + 1}: {str(e)}")
-                if attempt < MAX_RETRIES - 1:
-                    time.sleep(RETRY_DELAY)
+                retryable = policy.is_retryable(e)
+                if retryable:
+                    breaker.record_failure()
+                if retryable and attempt < policy.max_attempts - 1:
+                    delay = policy.delay(attempt, e)
+                    get_run_metrics().incr('retries_total', provider=operation_name)
+                    logger.info(f"{operation_name} - ponowienie za {delay:.1f}s")
+                    time.sleep(delay)
+                    continue
+                if retryable:
+                    error_msg = f"{operation_name} - wszystkie {attempt + 1} próby nieudane: {str(e)}"
                 else:
-                    error_msg = f"{operation_name} - wszystkie {MAX_RETRIES} próby nieudane: {str(e)}"
-                    self.errors.append(error_msg)
-                    logger.error(error_msg)
-                    return None
+                    error_msg = f"{operation_name} - błąd, którego nie warto ponawiać: {str(e)}"
+                self.errors.append(error_msg)
+                logger.error(error_msg)
+                return None
+
+
+_calendar_discovery_document: Optional[Dict[str, Any]] = None
+_calendar_discovery_lock = threading.Lock()
+# Scalanie nazw kalendarzy w cache metadanych (wspólny klucz dla wszystkich odbiorców)
+_calendar_names_lock = threading.Lock()
+
+
+def get_calendar_discovery_document() -> Optional[Dict[str, Any]]:
+    """Zwraca dołączony, okrojony dokument discovery Calendar API (None, jeśli pliku brak)"""
+    global _calendar_discovery_document
+    with _calendar_discovery_lock:
+        if _calendar_discovery_document is None and os.path.exists(CALENDAR_DISCOVERY_PATH):
+            try:
+                with open(CALENDAR_DISCOVERY_PATH, 'r', encoding='utf-8') as f:
+                    _calendar_discovery_document = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Nie udało się wczytać {CALENDAR_DISCOVERY_PATH}: {e}")
+        return _calendar_discovery_document
 
 
 class GoogleCalendarIntegration(APIIntegration):
     """Integracja z Google Calendar"""
     
-    def __init__(self):
+    def __init__(self, calendar_ids: Optional[List[str]] = None, credentials=None):
         super().__init__()
         self.service = None
-        self._authenticate()
+        self.credentials = None
+        # Jawna lista kalendarzy (tryb wsadowy, także pusta) ma pierwszeństwo przed GOOGLE_CALENDAR_IDS
+        self.calendar_ids = calendar_ids
+        self.metadata_cache = get_disk_cache('calendar', CALENDAR_METADATA_TTL)
+        # Stan synchronizacji przyrostowej: syncToken i lokalna kopia wydarzeń dla każdego kalendarza
+        self.sync_store = get_disk_cache('calendar_sync', CALENDAR_SYNC_STATE_TTL, max_entries=1000)
+        self._authenticate(credentials)
     
-    def _authenticate(self):
+    def _authenticate(self, creds=None):
         """Autentykacja z Google Calendar API"""
-        creds = None
+        if creds is not None:
+            # Poświadczenia współdzielone z inną instancją - pomijamy ponowną autoryzację
+            self._build_service(creds)
+            return
+        
         token_path = 'token.json'
         credentials_path = os.getenv('GOOGLE_CREDENTIALS_PATH', 'credentials.json')
         
         if os.path.exists(token_path):
+            from google.oauth2.credentials import Credentials
             creds = Credentials.from_authorized_user_file(token_path, SCOPES)
         
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
+                from google.auth.transport.requests import Request
                 creds.refresh(Request())
             else:
                 if os.path.exists(credentials_path):
+                    from google_auth_oauthlib.flow import InstalledAppFlow
                     flow = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES)
                     creds = flow.run_local_server(port=0)
                 else:
@@ -108,87 +846,427 @@ class GoogleCalendarIntegration(APIIntegration):
             with open(token_path, 'w') as token:
                 token.write(creds.to_json())
         
+        self._build_service(creds)
+    
+    def _build_service(self, creds):
+        """Tworzy klienta Google Calendar API dla podanych poświadczeń"""
+        self.credentials = creds
         try:
-            self.service = build('calendar', 'v3', credentials=creds)
+            from googleapiclient.discovery import build, build_from_document
+            
+            document = get_calendar_discovery_document()
+            if document is not None:
+                self.service = build_from_document(document, credentials=creds)
+            else:
+                self.service = build('calendar', 'v3', credentials=creds, static_discovery=True)
         except Exception as e:
             logger.error(f"Błąd podczas tworzenia serwisu Google Calendar: {e}")
     
+    def _fetch_calendar_list(self) -> Dict[str, str]:
+        """Pobiera nazwy wszystkich kalendarzy użytkownika jednym (stronicowanym) zapytaniem calendarList().list()"""
+        calendar_names = {}
+        page_token = None
+        while True:
+            calendar_list = self.service.calendarList().list(
+                pageToken=page_token,
+                fields='items(id,summary,primary),nextPageToken'
+            ).execute()
+            for entry in calendar_list.get('items', []):
+                calendar_names[entry['id']] = entry.get('summary', entry['id'])
+                if entry.get('primary'):
+                    calendar_names['primary'] = entry.get('summary', 'primary')
+            page_token = calendar_list.get('nextPageToken')
+            if not page_token:
+                return calendar_names
+    
+    def _get_calendar_names(self, calendar_ids: List[str]) -> Dict[str, str]:
+        """Zwraca nazwy kalendarzy z cache, uzupełniając go, gdy brakuje któregoś z ID"""
+        cache_key = 'calendar_names'
+        calendar_names = self.metadata_cache.get(cache_key) or {}
+        if all(calendar_id in calendar_names for calendar_id in calendar_ids):
+            return calendar_names
+        
+        # Brakujący kalendarz (nowy lub zmieniony) - pobieramy listę kalendarzy użytkownika
+        fetched = {}
+        try:
+            fetched = self._fetch_calendar_list()
+        except Exception as e:
+            logger.warning(f"Nie udało się pobrać listy kalendarzy: {e}")
+        
+        # Kalendarze spoza listy użytkownika (np. udostępnione przez ID) pobieramy pojedynczo
+        for calendar_id in calendar_ids:
+            if calendar_id not in calendar_names and calendar_id not in fetched:
+                try:
+                    calendar_info = self.service.calendars().get(calendarId=calendar_id).execute()
+                    fetched[calendar_id] = calendar_info.get('summary', calendar_id)
+                except Exception as e:
+                    # Zapamiętujemy samo ID, żeby nie ponawiać nieudanego zapytania przy każdym uruchomieniu
+                    logger.warning(f"Nie udało się pobrać nazwy kalendarza {calendar_id}: {e}")
+                    fetched[calendar_id] = calendar_id
+        
+        # Scalanie z aktualną zawartością cache - odbiorcy trybu wsadowego dopisują różne kalendarze równolegle
+        with _calendar_names_lock:
+            calendar_names = self.metadata_cache.get(cache_key) or {}
+            calendar_names.update(fetched)
+            self.metadata_cache.set(cache_key, calendar_names)
+        return calendar_names
+    
+    def _list_events_batch(self, list_params: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Pobiera wydarzenia z wielu kalendarzy zapytaniami batch HTTP, podążając za nextPageToken.
+
+        Zwraca dla każdego kalendarza słownik z listą `items`, ostatnim `nextSyncToken` i ewentualnym `error`.
+        """
+        results = {calendar_id: {'items': [], 'next_sync_token': None, 'error': None} for calendar_id in list_params}
+        # Kalendarze, dla których zostały strony do pobrania: calendar_id -> pageToken
+        pending = {calendar_id: None for calendar_id in list_params}
+        
+        while pending:
+            next_pending = {}
+            pending_items = list(pending.items())
+            
+            for offset in range(0, len(pending_items), CALENDAR_BATCH_SIZE):
+                chunk = pending_items[offset:offset + CALENDAR_BATCH_SIZE]
+                
+                def _callback(request_id, response, exception, chunk=chunk):
+                    calendar_id = chunk[int(request_id)][0]
+                    if exception is not None:
+                        results[calendar_id]['error'] = exception
+                        return
+                    results[calendar_id]['items'].extend(response.get('items', []))
+                    results[calendar_id]['next_sync_token'] = response.get('nextSyncToken')
+                    if response.get('nextPageToken'):
+                        next_pending[calendar_id] = response['nextPageToken']
+                
+                batch = self.service.new_batch_http_request(callback=_callback)
+                for index, (calendar_id, page_token) in enumerate(chunk):
+                    batch.add(
+                        self.service.events().list(calendarId=calendar_id, pageToken=page_token, **list_params[calendar_id]),
+                        request_id=str(index)
+                    )
+                with get_run_metrics().span('api_call', host='www.googleapis.com'):
+                    batch.execute()
+            
+            pending = next_pending
+        
+        return results
+    
+    @staticmethod
+    def _event_bounds(event: Dict[str, Any]) -> Tuple[Any, Any]:
+        """Zwraca początek i koniec wydarzenia (daty dla wydarzeń całodniowych, datetime UTC dla pozostałych)"""
+        start, end = event['start'], event.get('end', event['start'])
+        if 'dateTime' in start:
+            start_dt = datetime.fromisoformat(start['dateTime'].replace('Z', '+00:00')).astimezone(timezone.utc)
+            end_value = end.get('dateTime', start['dateTime'])
+            end_dt = datetime.fromisoformat(end_value.replace('Z', '+00:00')).astimezone(timezone.utc)
+            return start_dt, end_dt
+        start_date = datetime.fromisoformat(start['date']).date()
+        end_date = datetime.fromisoformat(end.get('date', start['date'])).date()
+        return start_date, end_date
+    
+    def _overlaps_day(self, event: Dict[str, Any], day_start: datetime, day_end: datetime) -> bool:
+        """Sprawdza, czy wydarzenie przypada na okno dnia (tak jak timeMin/timeMax w zapytaniu API)"""
+        start, end = self._event_bounds(event)
+        if isinstance(start, datetime):
+            return start <= day_end.replace(tzinfo=timezone.utc) and end > day_start.replace(tzinfo=timezone.utc)
+        # Wydarzenia całodniowe mają datę końca wyłączną
+        return start <= day_start.date() < end
+    
+    def _ends_before(self, event: Dict[str, Any], day_start: datetime) -> bool:
+        """Sprawdza, czy wydarzenie zakończyło się przed początkiem dnia"""
+        _, end = self._event_bounds(event)
+        if isinstance(end, datetime):
+            return end <= day_start.replace(tzinfo=timezone.utc)
+        return end <= day_start.date()
+    
+    def _starts_after(self, event: Dict[str, Any], moment: datetime) -> bool:
+        """Sprawdza, czy wydarzenie zaczyna się po danym momencie (poza zasięgiem synchronizacji)"""
+        start, _ = self._event_bounds(event)
+        if isinstance(start, datetime):
+            return start > moment.replace(tzinfo=timezone.utc)
+        return start > moment.date()
+    
+    def _sync_calendar_events(self, calendar_ids: List[str], day_start: datetime,
+                              day_end: datetime) -> Dict[str, Dict[str, Any]]:
+        """Synchronizuje przyrostowo wydarzenia przy użyciu syncToken i zwraca wydarzenia z okna dnia.
+
+        Pierwsze uruchomienie pobiera wydarzenia z okna CALENDAR_SYNC_HORIZON_DAYS dni od początku dnia,
+        kolejne - tylko zmiany od ostatniej synchronizacji, scalane z lokalną kopią. Gdy dzień wyjdzie
+        poza zasięg kopii, synchronizacja jest powtarzana od zera. Wynik ma format `_list_events_batch`.
+        """
+        horizon = day_start + timedelta(days=CALENDAR_SYNC_HORIZON_DAYS)
+        full_sync_params = {
+            'timeMin': day_start.isoformat() + 'Z',
+            'timeMax': horizon.isoformat() + 'Z',
+            'singleEvents': True,
+            'maxResults': 250
+        }
+        states = {calendar_id: self.sync_store.get(f"sync:{calendar_id}") for calendar_id in calendar_ids}
+        
+        list_params = {}
+        for calendar_id, state in states.items():
+            if state and state.get('sync_token') and state.get('horizon', '') >= day_end.isoformat():
+                # API wymaga tych samych parametrów co przy pełnej synchronizacji (poza timeMin/timeMax);
+                # bez singleEvents zmiany serii cyklicznych wracają jako wydarzenia główne serii
+                list_params[calendar_id] = {'syncToken': state['sync_token'], 'singleEvents': True, 'maxResults': 250}
+            else:
+                states[calendar_id] = None
+                list_params[calendar_id] = full_sync_params
+        
+        results = self._list_events_batch(list_params)
+        
+        # Wygasły syncToken (HTTP 410) - stan jest nieaktualny, potrzebna pełna synchronizacja
+        expired = [
+            calendar_id for calendar_id, result in results.items()
+            if result['error'] is not None and getattr(getattr(result['error'], 'resp', None), 'status', None) == 410
+        ]
+        if expired:
+            logger.warning(f"Wygasły syncToken dla kalendarzy: {', '.join(expired)} - pełna synchronizacja")
+            for calendar_id in expired:
+                states[calendar_id] = None
+            results.update(self._list_events_batch({calendar_id: full_sync_params for calendar_id in expired}))
+        
+        for calendar_id, result in results.items():
+            if result['error'] is not None:
+                continue
+            
+            state = states[calendar_id]
+            events = dict(state['events']) if state else {}
+            sync_horizon = datetime.fromisoformat(state['horizon']) if state else horizon
+            for event in result['items']:
+                if event.get('status') == 'cancelled':
+                    events.pop(event['id'], None)
+                elif not self._starts_after(event, sync_horizon):
+                    events[event['id']] = {
+                        key: event[key] for key in ('id', 'start', 'end', 'summary', 'location') if key in event
+                    }
+            
+            # Wydarzenia zakończone przed dzisiejszym dniem nie będą już potrzebne
+            kept = {event_id: event for event_id, event in events.items() if not self._ends_before(event, day_start)}
+            # Bez zmian stary syncToken pozostaje ważny - stanu nie trzeba zapisywać ponownie
+            if not state or result['items'] or len(kept) != len(events):
+                self.sync_store.set(f"sync:{calendar_id}", {
+                    'sync_token': result['next_sync_token'],
+                    'horizon': sync_horizon.isoformat(),
+                    'events': kept
+                })
+            events = kept
+            
+            logger.info(
+                f"Synchronizacja kalendarza {calendar_id}: {len(result['items'])} zmian "
+                f"({'przyrostowa' if state else 'pełna'})"
+            )
+            result['items'] = [event for event in events.values() if self._overlaps_day(event, day_start, day_end)]
+        
+        return results
+    
+    @staticmethod
+    def _format_event(event: Dict[str, Any], calendar_name: str) -> Dict[str, Any]:
+        """Zamienia wydarzenie z Google Calendar API na format używany w digeście"""
+        start_time = event['start'].get('dateTime', event['start'].get('date'))
+        summary = event.get('summary', 'Brak tytułu')
+        location = event.get('location', '')
+        # Usuwamy pole description zgodnie z żądaniem
+        
+        # Formatowanie czasu bez uwzględniania strefy czasowej
+        if 'T' in start_time:  # DateTime format
+            # Parsuj czas do obiektu datetime i wyciągnij tylko godzinę i minutę
+            # Usuń informacje o strefie czasowej jeśli są obecne
+            clean_time = start_time.split('+')[0].split('Z')[0]  # Usuń timezone info
+            start_dt = datetime.fromisoformat(clean_time)
+            time_str = start_dt.strftime('%H:%M')
+        else:  # Date format (cały dzień)
+            time_str = 'Cały dzień'
+        
+        return {
+            'time': time_str,
+            'title': summary,
+            'location': location,
+            'calendar_name': calendar_name  # Przekazujemy nazwę kalendarza zamiast ID
+        }
+    
     def get_today_events(self) -> List[Dict[str, Any]]:
         """Pobiera wydarzenia z kalendarza na dziś"""
         if not self.service:
             return []
         
         def _get_events():
-            # Zamiast pojedynczego ID, używamy listy ID kalendarzy
-            calendar_ids_str = os.getenv('GOOGLE_CALENDAR_IDS', 'primary')
-            # Dzielimy string z ID kalendarzy po przecinku
-            calendar_ids = [cal_id.strip() for cal_id in calendar_ids_str.split(',')]
+            calendar_ids = self._resolve_calendar_ids()
+            if not calendar_ids:
+                return []
             
             # Dziś od 00:00 do 23:59
             today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
             today_end = today_start + timedelta(days=1) - timedelta(seconds=1)
             
+            # Nazwy kalendarzy z cache metadanych zamiast osobnego zapytania dla każdego kalendarza
+            calendar_names = self._get_calendar_names(calendar_ids)
+            
+            if CALENDAR_SYNC_MODE == 'incremental':
+                # Tylko zmiany od ostatniego uruchomienia, scalane z lokalną kopią wydarzeń
+                results = self._sync_calendar_events(calendar_ids, today_start, today_end)
+            else:
+                # Wszystkie kalendarze pobierane jednym zapytaniem batch (z pełnym stronicowaniem)
+                list_params = {
+                    'timeMin': today_start.isoformat() + 'Z',
+                    'timeMax': today_end.isoformat() + 'Z',
+                    'singleEvents': True,
+                    'orderBy': 'startTime',
+                    'maxResults': 250
+                }
+                results = self._list_events_batch({calendar_id: list_params for calendar_id in calendar_ids})
+            
             formatted_events = []
-            # Iterujemy po wszystkich kalendarzach
             for calendar_id in calendar_ids:
-                try:
-                    # Pobierz informacje o kalendarzu, aby uzyskać jego nazwę
-                    calendar_info = self.service.calendars().get(calendarId=calendar_id).execute()
-                    calendar_name = calendar_info.get('summary', calendar_id)
-                    
-                    events_result = self.service.events().list(
-                        calendarId=calendar_id,
-                        timeMin=today_start.isoformat() + 'Z',
-                        timeMax=today_end.isoformat() + 'Z',
-                        singleEvents=True,
-                        orderBy='startTime'
-                    ).execute()
-                    
-                    events = events_result.get('items', [])
-                    logger.info(f"Pobrano {len(events)} wydarzeń z kalendarza {calendar_name}")
-                    
-                    for event in events:
-                        start_time = event['start'].get('dateTime', event['start'].get('date'))
-                        summary = event.get('summary', 'Brak tytułu')
-                        location = event.get('location', '')
-                        # Usuwamy pole description zgodnie z żądaniem
-                        
-                        # Formatowanie czasu bez uwzględniania strefy czasowej
-                        if 'T' in start_time:  # DateTime format
-                            # Parsuj czas do obiektu datetime i wyciągnij tylko godzinę i minutę
-                            # Usuń informacje o strefie czasowej jeśli są obecne
-                            clean_time = start_time.split('+')[0].split('Z')[0]  # Usuń timezone info
-                            start_dt = datetime.fromisoformat(clean_time)
-                            time_str = start_dt.strftime('%H:%M')
-                        else:  # Date format (cały dzień)
-                            time_str = 'Cały dzień'
-                        
-                        formatted_events.append({
-                            'time': time_str,
-                            'title': summary,
-                            'location': location,
-                            'calendar_name': calendar_name  # Przekazujemy nazwę kalendarza zamiast ID
-                        })
-                except Exception as e:
-                    error_msg = f"Błąd podczas pobierania wydarzeń z kalendarza {calendar_id}: {str(e)}"
+                calendar_name = calendar_names.get(calendar_id, calendar_id)
+                result = results[calendar_id]
+                if result['error'] is not None:
+                    error_msg = f"Błąd podczas pobierania wydarzeń z kalendarza {calendar_id}: {str(result['error'])}"
                     logger.error(error_msg)
                     self.errors.append(error_msg)
+                    continue
+                
+                logger.info(f"Pobrano {len(result['items'])} wydarzeń z kalendarza {calendar_name}")
+                formatted_events.extend(self._format_event(event, calendar_name) for event in result['items'])
             
             # Sortowanie wszystkich wydarzeń według czasu
-            formatted_events.sort(key=lambda event: '00:00' if event['time'] == 'Cały dzień' else event['time'])
+            formatted_events.sort(key=self._event_sort_key)
             
             return formatted_events
         
         return self.retry_operation("Google Calendar", _get_events) or []
+    
+    def _resolve_calendar_ids(self) -> List[str]:
+        """Jawna lista kalendarzy lub lista z GOOGLE_CALENDAR_IDS"""
+        # Zamiast pojedynczego ID, używamy listy ID kalendarzy
+        if self.calendar_ids is not None:
+            return self.calendar_ids
+        calendar_ids_str = os.getenv('GOOGLE_CALENDAR_IDS', 'primary')
+        # Dzielimy string z ID kalendarzy po przecinku
+        return [cal_id.strip() for cal_id in calendar_ids_str.split(',')]
+    
+    @staticmethod
+    def _event_sort_key(event: Dict[str, Any]) -> str:
+        return '00:00' if event['time'] == 'Cały dzień' else event['time']
+    
+    def get_synced_snapshot(self) -> Optional[Dict[str, Any]]:
+        """Kopia dzisiejszych wydarzeń z lokalnego stanu synchronizacji przyrostowej (bez zapytań do API) lub None.
+
+        Wymaga stanu dla każdego kalendarza, którego zasięg (CALENDAR_SYNC_HORIZON_DAYS) obejmuje dzisiejszy dzień.
+        """
+        calendar_ids = self._resolve_calendar_ids()
+        if not calendar_ids:
+            return None
+        
+        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        today_end = today_start + timedelta(days=1) - timedelta(seconds=1)
+        calendar_names = (self.metadata_cache.get_stale('calendar_names') or ({}, 0))[0] or {}
+        
+        events = []
+        synced_at = None
+        for calendar_id in calendar_ids:
+            entry = self.sync_store.get_stale(f"sync:{calendar_id}")
+            if entry is None:
+                return None
+            state, stored_at = entry
+            if not state or state.get('horizon', '') < today_end.isoformat():
+                return None
+            calendar_name = calendar_names.get(calendar_id, calendar_id)
+            events.extend(
+                self._format_event(event, calendar_name) for event in state['events'].values()
+                if self._overlaps_day(event, today_start, today_end)
+            )
+            synced_at = stored_at if synced_at is None else min(synced_at, stored_at)
+        
+        events.sort(key=self._event_sort_key)
+        return SnapshotStore.make_snapshot(events, datetime.fromtimestamp(synced_at))
+
+
+class ForecastColumns:
+    """Prognoza OpenWeatherMap w układzie kolumnowym (tablice `array`).
+
+    Payload (do 40 przedziałów 3-godzinnych) jest parsowany raz, a agregaty dzienne liczone są
+    na wycinkach kolumn - bez budowania słownika dla każdego przedziału.
+    """
+    
+    def __init__(self, slots: List[Dict[str, Any]]):
+        self.timestamps = array('q', (slot['dt'] for slot in slots))
+        self.temperature = array('d', (slot['main']['temp'] for slot in slots))
+        self.feels_like = array('d', (slot['main']['feels_like'] for slot in slots))
+        self.humidity = array('d', (slot['main']['humidity'] for slot in slots))
+        self.pressure = array('d', (slot['main']['pressure'] for slot in slots))
+        self.wind_speed = array('d', (slot['wind']['speed'] for slot in slots))
+        self.pop = array('d', (slot.get('pop', 0) for slot in slots))
+        self.descriptions = [slot['weather'][0]['description'] for slot in slots]
+        self.icons = [slot['weather'][0]['icon'] for slot in slots]
+        
+        # Numer dnia w lokalnej strefie czasowej; przesunięcie liczone dla każdego przedziału (zmiana czasu)
+        self.local_seconds = array('q', (ts + time.localtime(ts).tm_gmtoff for ts in self.timestamps))
+        self.days = array('q', (seconds // 86400 for seconds in self.local_seconds))
+    
+    def __len__(self) -> int:
+        return len(self.timestamps)
+    
+    def day_range(self, day: int) -> range:
+        """Zakres indeksów przedziałów danego dnia (przedziały są posortowane po czasie)"""
+        return range(bisect.bisect_left(self.days, day), bisect.bisect_right(self.days, day))
+    
+    def slot(self, i: int) -> Dict[str, Any]:
+        """Zwraca przedział prognozy w formacie używanym przez szablon e-maila"""
+        seconds_of_day = self.local_seconds[i] % 86400
+        return {
+            'time': f"{seconds_of_day // 3600:02d}:{seconds_of_day % 3600 // 60:02d}",
+            'temperature': round(self.temperature[i]),
+            'feels_like': round(self.feels_like[i]),
+            'description': self.descriptions[i].capitalize(),
+            'humidity': int(self.humidity[i]),
+            'pressure': int(self.pressure[i]),
+            'wind_speed': self.wind_speed[i],
+            'icon': self.icons[i],
+            'rain_probability': round(self.pop[i] * 100)  # Prawdopodobieństwo opadów
+        }
+    
+    def summary(self, indices: range) -> Dict[str, Any]:
+        """Agregaty dla zakresu przedziałów: temperatura min/max, średnia wilgotność, maks. szansa opadów"""
+        if not indices:
+            return {'min_temp': 'N/A', 'max_temp': 'N/A', 'avg_humidity': 'N/A'}
+        window = slice(indices.start, indices.stop)
+        humidity = self.humidity[window]
+        return {
+            'min_temp': round(min(self.temperature[window])),
+            'max_temp': round(max(self.temperature[window])),
+            'avg_humidity': round(sum(humidity) / len(humidity)),
+            'rain_probability': round(max(self.pop[window]) * 100)
+        }
+    
+    def daily_summaries(self, skip_day: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Podsumowania dni po `skip_day` (ikona i opis z przedziału najbliższego południa)"""
+        summaries = []
+        for day in dict.fromkeys(self.days):
+            if skip_day is not None and day <= skip_day:
+                continue
+            indices = self.day_range(day)
+            midday = min(indices, key=lambda i: abs(self.local_seconds[i] % 86400 - 43200))
+            date = datetime(1970, 1, 1) + timedelta(days=day)
+            summaries.append({
+                'date': date.strftime('%d.%m'),
+                'weekday': WEEKDAY_NAMES[date.weekday()],
+                'icon': self.icons[midday],
+                'description': self.descriptions[midday].capitalize(),
+                **self.summary(indices)
+            })
+        return summaries
 
 
 class WeatherIntegration(APIIntegration):
     """Integracja z OpenWeatherMap API"""
     
-    def __init__(self):
+    def __init__(self, city: Optional[str] = None, language: Optional[str] = None):
         super().__init__()
         self.api_key = os.getenv('OPENWEATHERMAP_API_KEY')
-        self.city = os.getenv('WEATHER_CITY', 'Warsaw')
+        self.city = city or os.getenv('WEATHER_CITY', 'Warsaw')
+        self.language = language or DEFAULT_LANGUAGE
+        self.units = 'metric'
+        self.cache = get_disk_cache('weather', WEATHER_CACHE_TTL, WEATHER_CACHE_MAX_ENTRIES)
     
     def get_weather_forecast(self) -> Dict[str, Any]:
         """Pobiera prognozę pogody na dziś z podziałem na godziny"""
@@ -202,233 +1280,632 @@ class WeatherIntegration(APIIntegration):
             params = {
                 'q': self.city,
                 'appid': self.api_key,
-                'units': 'metric',
-                'lang': 'pl'
+                'units': self.units,
+                'lang': self.language
             }
             
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Filtruj prognozy tylko na dziś
-            today = datetime.now().date()
-            today_forecasts = []
-            
-            for forecast in data['list']:
-                forecast_time = datetime.fromtimestamp(forecast['dt'])
-                if forecast_time.date() == today:
-                    today_forecasts.append({
-                        'time': forecast_time.strftime('%H:%M'),
-                        'temperature': round(forecast['main']['temp']),
-                        'feels_like': round(forecast['main']['feels_like']),
-                        'description': forecast['weather'][0]['description'].capitalize(),
-                        'humidity': forecast['main']['humidity'],
-                        'pressure': forecast['main']['pressure'],
-                        'wind_speed': forecast['wind']['speed'],
-                        'icon': forecast['weather'][0]['icon'],
-                        'rain_probability': round(forecast.get('pop', 0) * 100)  # Prawdopodobieństwo opadów
-                    })
-            
-            # Jeśli nie ma prognoz na dziś (np. późno wieczorem), weź pierwszą dostępną
-            if not today_forecasts and data['list']:
-                first_forecast = data['list'][0]
-                forecast_time = datetime.fromtimestamp(first_forecast['dt'])
-                today_forecasts.append({
-                    'time': forecast_time.strftime('%H:%M'),
-                    'temperature': round(first_forecast['main']['temp']),
-                    'feels_like': round(first_forecast['main']['feels_like']),
-                    'description': first_forecast['weather'][0]['description'].capitalize(),
-                    'humidity': first_forecast['main']['humidity'],
-                    'pressure': first_forecast['main']['pressure'],
-                    'wind_speed': first_forecast['wind']['speed'],
-                    'icon': first_forecast['weather'][0]['icon'],
-                    'rain_probability': round(first_forecast.get('pop', 0) * 100)
-                })
+            # Prognoza zmienia się co kilka godzin - pełny 5-dniowy payload trzymamy w cache
+            cache_key = self._cache_key()
+            data = self.cache.get(cache_key)
+            if data is None:
+                response = self.http.get(url, params=params)
+                response.raise_for_status()
+                data = response.json()
+                self.cache.set(cache_key, data)
+            else:
+                logger.info(f"Prognoza pogody dla {self.city} pobrana z cache")
             
-            return {
-                'city': data['city']['name'],
-                'forecasts': today_forecasts,
-                'summary': {
-                    'min_temp': min([f['temperature'] for f in today_forecasts]) if today_forecasts else 'N/A',
-                    'max_temp': max([f['temperature'] for f in today_forecasts]) if today_forecasts else 'N/A',
-                    'avg_humidity': round(sum([f['humidity'] for f in today_forecasts]) / len(today_forecasts)) if today_forecasts else 'N/A'
-                }
-            }
+            return self.build_forecast(data)
         
         return self.retry_operation("OpenWeatherMap", _get_weather) or {}
-
-
-class NotionIntegration(APIIntegration):
-    """Integracja z Notion API"""
     
-    def __init__(self):
-        super().__init__()
-        self.token = os.getenv('NOTION_TOKEN')
-        self.database_id = os.getenv('NOTION_DATABASE_ID')
-        self.headers = {
-            'Authorization': f'Bearer {self.token}',
-            'Content-Type': 'application/json',
-            'Notion-Version': '2022-06-28'
-        }
+    def _cache_key(self) -> str:
+        return f"forecast:{self.city.lower()}:{self.units}:{self.language}"
     
-    def get_articles_not_started(self) -> List[Dict[str, Any]]:
-        """Pobiera artykuły ze statusem 'Not started' i zmienia ich status na 'Done'."""
-        if not self.token or not self.database_id:
-            self.errors.append("Brak tokenu lub ID bazy danych Notion")
-            return []
+    @staticmethod
+    def build_forecast(data: Dict[str, Any], fallback_to_first: bool = True) -> Dict[str, Any]:
+        """Wycina prognozę na dziś z pełnego payloadu (pusty słownik, gdy nie ma w nim przedziałów z dziś)"""
+        columns = ForecastColumns(data['list'])
+        today = (datetime.now() - datetime(1970, 1, 1)).days
+        indices = columns.day_range(today)
         
-        def _get_articles():
-            # Pobierz artykuły ze statusem "Not started"
-            query_url = f"https://api.notion.com/v1/databases/{self.database_id}/query"
-            
-            query_data = {
-                    "filter": {
-                        "property": "Status",
-                        "select": {
-                        "equals": "Not started"
-                        }
-                    }
+        # Jeśli nie ma prognoz na dziś (np. późno wieczorem), weź pierwszą dostępną
+        if not indices and len(columns) and fallback_to_first:
+            indices = range(0, 1)
+        if not indices:
+            return {}
+        
+        result = {
+            'city': data['city']['name'],
+            'forecasts': [columns.slot(i) for i in indices],
+            'summary': columns.summary(indices)
+        }
+        if WEATHER_WEEK_AHEAD:
+            result['days'] = columns.daily_summaries(skip_day=today)
+        return result
+    
+    def get_cached_snapshot(self) -> Optional[Dict[str, Any]]:
+        """Kopia prognozy na dziś z ostatniego zapisanego payloadu (także po upływie TTL) lub None.
+
+        Payload obejmuje 5 dni, więc pobrany poprzedniego dnia nadal zawiera dzisiejsze przedziały.
+        """
+        entry = self.cache.get_stale(self._cache_key())
+        if entry is None:
+            return None
+        data, stored_at = entry
+        try:
+            forecast = self.build_forecast(data, fallback_to_first=False)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Niepoprawny zapisany payload prognozy dla {self.city}: {e}")
+            return None
+        if not forecast:
+            return None
+        return SnapshotStore.make_snapshot(forecast, datetime.fromtimestamp(stored_at))
+
+
+class NotionUpdateScheduler:
+    """Kolejka aktualizacji stron Notion wykonywanych równolegle w ramach limitu zapytań.
+
+    Odpowiedzi 429 (i chwilowe błędy 5xx) wstrzymują wspólny limiter na czas z nagłówka Retry-After,
+    po czym aktualizacja jest ponawiana.
+    """
+    
+    RETRYABLE_STATUSES = (429, 502, 503, 504)
+    
+    def __init__(self, http: HTTPSession, headers: Dict[str, str], rate_limiter: TokenBucket,
+                 workers: int = NOTION_UPDATE_WORKERS):
+        self.http = http
+        self.headers = headers
+        self.rate_limiter = rate_limiter
+        self.workers = max(workers, 1)
+    
+    def _update_page(self, page_id: str, properties: Dict[str, Any]) -> None:
+        """Wysyła PATCH dla jednej strony, ponawiając po przekroczeniu limitu"""
+        update_url = f"https://api.notion.com/v1/pages/{page_id}"
+        for attempt in range(MAX_RETRIES):
+            self.rate_limiter.acquire()
+            response = self.http.patch(update_url, headers=self.headers, json={"properties": properties})
+            if response.status_code in self.RETRYABLE_STATUSES and attempt < MAX_RETRIES - 1:
+                retry_after = parse_retry_after(response)
+                logger.warning(f"Notion - odpowiedź {response.status_code}, ponowienie za {retry_after:.1f}s")
+                get_run_metrics().incr('retries_total', provider='Notion')
+                self.rate_limiter.pause(retry_after)
+                continue
+            response.raise_for_status()
+            return
+    
+    def run(self, updates: List[Tuple[str, str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Wykonuje aktualizacje (etykieta, page_id, properties) i zwraca statystyki"""
+        stats = {
+            'succeeded': 0, 'failed': 0, 'errors': [], 'updated_page_ids': [],
+            'elapsed_seconds': 0.0, 'updates_per_second': 0.0
+        }
+        if not updates:
+            return stats
+        
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(updates)), thread_name_prefix='notion-update') as executor:
+            futures = {
+                executor.submit(self._update_page, page_id, properties): (label, page_id)
+                for label, page_id, properties in updates
             }
-            
-            response = requests.post(query_url, headers=self.headers, json=query_data, timeout=10)
+            for future, (label, page_id) in futures.items():
+                try:
+                    future.result()
+                    stats['succeeded'] += 1
+                    stats['updated_page_ids'].append(page_id)
+                    logger.info(f"Zmieniono status artykułu '{label}' na 'Done'")
+                except Exception as e:
+                    stats['failed'] += 1
+                    stats['errors'].append(f"Błąd podczas aktualizacji statusu artykułu '{label}': {str(e)}")
+        
+        elapsed = time.monotonic() - start
+        stats['elapsed_seconds'] = round(elapsed, 3)
+        stats['updates_per_second'] = round(stats['succeeded'] / elapsed, 2) if elapsed > 0 else 0.0
+        return stats
+
+
+class NotionArticleIndex:
+    """Lokalny indeks SQLite bazy artykułów Notion.
+
+    Indeks jest aktualizowany przyrostowo (strony zmienione od ostatniej synchronizacji według
+    last_edited_time), a losowanie artykułów odbywa się lokalnie. Okresowa pełna synchronizacja
+    usuwa z indeksu strony skasowane lub zarchiwizowane w Notion.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS articles (
+                    database_id TEXT NOT NULL,
+                    page_id TEXT NOT NULL,
+                    name TEXT,
+                    link TEXT,
+                    author TEXT,
+                    status TEXT,
+                    last_edited_time TEXT,
+                    PRIMARY KEY (database_id, page_id)
+                );
+                CREATE INDEX IF NOT EXISTS articles_status ON articles (database_id, status);
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    database_id TEXT PRIMARY KEY,
+                    last_edited_time TEXT,
+                    last_full_sync REAL
+                );
+            """)
+    
+    def get_sync_state(self, database_id: str) -> Tuple[Optional[str], float]:
+        """Zwraca (last_edited_time ostatniej zsynchronizowanej zmiany, czas ostatniej pełnej synchronizacji)"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT last_edited_time, last_full_sync FROM sync_state WHERE database_id = ?", (database_id,)
+            ).fetchone()
+        return (row[0], row[1] or 0.0) if row else (None, 0.0)
+    
+    def apply_pages(self, database_id: str, pages: Iterable[Dict[str, Any]], full_sync: bool) -> int:
+        """Zapisuje strony w indeksie (przy pełnej synchronizacji zastępuje całą zawartość bazy).
+
+        Strony są pobierane poza blokadą, a każda porcja NOTION_PAGE_SIZE stron zapisywana jest w krótkiej
+        transakcji - długa synchronizacja nie blokuje odczytów indeksu przez innych odbiorców.
+        """
+        previous_cursor, last_full_sync = self.get_sync_state(database_id)
+        cursor = previous_cursor if not full_sync else None
+        insert_sql = "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?)"
+        seen_page_ids = set()
+        rows = []
+        
+        for page in pages:
+            article = NotionIntegration._parse_article(page)
+            status_property = page['properties'].get('Status', {})
+            status = (status_property.get('select') or {}).get('name', '')
+            edited = page.get('last_edited_time', '')
+            cursor = max(cursor or edited, edited)
+            seen_page_ids.add(article['page_id'])
+            rows.append((database_id, article['page_id'], article['name'], article['link'], article['author'],
+                         status, edited))
+            if len(rows) >= NOTION_PAGE_SIZE:
+                with self._lock, self._connection:
+                    self._connection.executemany(insert_sql, rows)
+                rows.clear()
+        
+        with self._lock, self._connection:
+            self._connection.executemany(insert_sql, rows)
+            if full_sync:
+                # Strony, których pełna synchronizacja nie zwróciła, zostały skasowane lub zarchiwizowane
+                indexed = self._connection.execute(
+                    "SELECT page_id FROM articles WHERE database_id = ?", (database_id,)
+                ).fetchall()
+                self._connection.executemany(
+                    "DELETE FROM articles WHERE database_id = ? AND page_id = ?",
+                    [(database_id, page_id) for (page_id,) in indexed if page_id not in seen_page_ids]
+                )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                (database_id, cursor or previous_cursor, time.time() if full_sync else last_full_sync)
+            )
+        return len(seen_page_ids)
+    
+    def select_random(self, database_id: str, status: str, limit: int) -> List[Dict[str, Any]]:
+        """Losuje artykuły o danym statusie z indeksu"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT name, link, author, page_id FROM articles WHERE database_id = ? AND status = ? "
+                "ORDER BY RANDOM() LIMIT ?", (database_id, status, limit)
+            ).fetchall()
+        return [{'name': name, 'link': link, 'author': author, 'page_id': page_id} for name, link, author, page_id in rows]
+    
+    def set_status(self, database_id: str, page_ids: List[str], status: str) -> None:
+        """Aktualizuje status artykułów w indeksie (po udanej zmianie w Notion)"""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "UPDATE articles SET status = ? WHERE database_id = ? AND page_id = ?",
+                [(status, database_id, page_id) for page_id in page_ids]
+            )
+
+
+_notion_indexes: Dict[str, NotionArticleIndex] = {}
+_notion_indexes_lock = threading.Lock()
+
+
+def get_notion_index(path: str) -> NotionArticleIndex:
+    """Zwraca współdzielony indeks artykułów dla danego pliku SQLite"""
+    with _notion_indexes_lock:
+        if path not in _notion_indexes:
+            _notion_indexes[path] = NotionArticleIndex(path)
+        return _notion_indexes[path]
+
+
+class NotionIntegration(APIIntegration):
+    """Integracja z Notion API"""
+    
+    def __init__(self, database_id: Optional[str] = None):
+        super().__init__()
+        self.token = os.getenv('NOTION_TOKEN')
+        self.database_id = database_id or os.getenv('NOTION_DATABASE_ID')
+        self.headers = {
+            'Authorization': f'Bearer {self.token}',
+            'Content-Type': 'application/json',
+            'Notion-Version': '2022-06-28'
+        }
+        # Limit zapytań dotyczy całej integracji (tokenu), więc limiter jest współdzielony
+        self.rate_limiter = get_rate_limiter(f"notion:{self.token}", NOTION_RATE_LIMIT)
+        self.schema_cache = get_disk_cache('notion_schema', NOTION_SCHEMA_TTL)
+        self.index = get_notion_index(NOTION_INDEX_PATH) if NOTION_INDEX_PATH else None
+        self.update_scheduler = NotionUpdateScheduler(self.http, self.headers, self.rate_limiter)
+    
+    def _get_property_ids(self, property_names: List[str]) -> List[str]:
+        """Zamienia nazwy właściwości bazy na ich ID (wymagane przez parametr filter_properties)"""
+        if not property_names:
+            return []
+        
+        cache_key = f"property_ids:{self.database_id}"
+        property_ids = self.schema_cache.get(cache_key)
+        if property_ids is None:
+            try:
+                self.rate_limiter.acquire()
+                response = self.http.get(f"https://api.notion.com/v1/databases/{self.database_id}", headers=self.headers)
+                response.raise_for_status()
+                schema = response.json().get('properties', {})
+                property_ids = {name: prop['id'] for name, prop in schema.items()}
+                self.schema_cache.set(cache_key, property_ids)
+            except Exception as e:
+                # Bez projekcji zapytanie nadal działa, tylko zwraca pełne strony
+                logger.warning(f"Nie udało się pobrać schematu bazy Notion: {e}")
+                return []
+        
+        return [property_ids[name] for name in property_names if name in property_ids]
+    
+    def iter_database_pages(self, query_filter: Optional[Dict[str, Any]] = None,
+                            property_names: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Strumieniowo zwraca strony z bazy, pobierając kolejne porcje wyników (start_cursor)"""
+        query_url = f"https://api.notion.com/v1/databases/{self.database_id}/query"
+        params = {'filter_properties': self._get_property_ids(property_names or [])}
+        
+        query_data = {"page_size": NOTION_PAGE_SIZE}
+        if query_filter:
+            query_data["filter"] = query_filter
+        
+        while True:
+            self.rate_limiter.acquire()
+            response = self.http.post(query_url, headers=self.headers, params=params, json=query_data)
             response.raise_for_status()
             data = response.json()
             
-            all_articles = []
-            for result in data.get('results', []):
-                # Pobierz dane artykułu
-                properties = result['properties']
-                
-                name = ''
-                if 'Name' in properties and properties['Name']['type'] == 'title':
-                    name = ''.join([text['plain_text'] for text in properties['Name']['title']])
-                
-                link = ''
-                if 'Link' in properties and properties['Link']['type'] == 'url':
-                    link = properties['Link']['url'] or ''
-                
-                author = ''
-                if 'Author' in properties:
-                    if properties['Author']['type'] == 'rich_text':
-                        author = ''.join([text['plain_text'] for text in properties['Author']['rich_text']])
-                    elif properties['Author']['type'] == 'select':
-                        author = properties['Author']['select']['name'] if properties['Author']['select'] else ''
-                
-                all_articles.append({
-                    'name': name,
-                    'link': link,
-                    'author': author,
-                    'page_id': result['id']
-                })
-            
-            selected_articles = []
-            if len(all_articles) > 3:
-                selected_articles = random.sample(all_articles, 3)
-            else:
-                selected_articles = all_articles
-            
-            # Zmień status wybranych artykułów na "Done"
-            self._update_article_status(selected_articles)
+            yield from data.get('results', [])
             
-            return selected_articles
+            if not data.get('has_more') or not data.get('next_cursor'):
+                return
+            query_data["start_cursor"] = data['next_cursor']
+    
+    @staticmethod
+    def _parse_article(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Wyciąga dane artykułu ze strony Notion"""
+        properties = result['properties']
         
-        return self.retry_operation("Notion", _get_articles) or []
+        name = ''
+        if 'Name' in properties and properties['Name']['type'] == 'title':
+            name = ''.join([text['plain_text'] for text in properties['Name']['title']])
+        
+        link = ''
+        if 'Link' in properties and properties['Link']['type'] == 'url':
+            link = properties['Link']['url'] or ''
+        
+        author = ''
+        if 'Author' in properties:
+            if properties['Author']['type'] == 'rich_text':
+                author = ''.join([text['plain_text'] for text in properties['Author']['rich_text']])
+            elif properties['Author']['type'] == 'select':
+                author = properties['Author']['select']['name'] if properties['Author']['select'] else ''
+        
+        return {
+            'name': name,
+            'link': link,
+            'author': author,
+            'page_id': result['id']
+        }
     
-    def _update_article_status(self, articles: List[Dict[str, Any]]) -> None:
-        """Zmienia status artykułów na 'Done'."""
-        for article in articles:
-            page_id = article.get('page_id')
-            if not page_id:
-                continue
-                
-            update_url = f"https://api.notion.com/v1/pages/{page_id}"
-            update_data = {
-                "properties": {
-                    "Status": {
-                        "select": {
-                            "name": "Done"
-                        }
-                    }
+    def _sync_index(self) -> None:
+        """Aktualizuje lokalny indeks o strony zmienione od ostatniej synchronizacji"""
+        cursor, last_full_sync = self.index.get_sync_state(self.database_id)
+        full_sync = cursor is None or time.time() - last_full_sync > NOTION_INDEX_FULL_RESYNC
+        query_filter = None
+        if not full_sync:
+            query_filter = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": cursor}}
+        
+        start = time.monotonic()
+        pages = self.iter_database_pages(query_filter, NOTION_FILTER_PROPERTIES + ['Status'])
+        count = self.index.apply_pages(self.database_id, pages, full_sync)
+        logger.info(
+            f"Indeks Notion: {'pełna' if full_sync else 'przyrostowa'} synchronizacja, "
+            f"{count} stron w {time.monotonic() - start:.2f}s"
+        )
+    
+    def get_articles_not_started(self) -> List[Dict[str, Any]]:
+        """Losuje artykuły ze statusem 'Not started' (bez zmiany statusu - patrz mark_articles_done)."""
+        if not self.token or not self.database_id:
+            self.errors.append("Brak tokenu lub ID bazy danych Notion")
+            return []
+        
+        def _get_articles_from_index():
+            # Do Notion trafiają tylko zmiany od ostatniej synchronizacji, losowanie odbywa się lokalnie
+            self._sync_index()
+            return self.index.select_random(self.database_id, 'Not started', ARTICLES_PER_DIGEST)
+        
+        if self.index is not None:
+            return self.retry_operation("Notion", _get_articles_from_index) or []
+        
+        def _get_articles():
+            # Pobierz artykuły ze statusem "Not started"
+            query_filter = {
+                "property": "Status",
+                "select": {
+                    "equals": "Not started"
                 }
             }
             
-            try:
-                response = requests.patch(update_url, headers=self.headers, json=update_data, timeout=10)
-                response.raise_for_status()
-                logger.info(f"Zmieniono status artykułu '{article['name']}' na 'Done'")
-            except Exception as e:
-                error_msg = f"Błąd podczas aktualizacji statusu artykułu '{article['name']}': {str(e)}"
-                logger.error(error_msg)
-                self.errors.append(error_msg)
+            # Wszystkie strony wyników przechodzą przez losowanie rezerwuarowe - w pamięci jest tylko próbka
+            pages = self.iter_database_pages(query_filter, NOTION_FILTER_PROPERTIES)
+            return reservoir_sample((self._parse_article(page) for page in pages), ARTICLES_PER_DIGEST)
+        
+        return self.retry_operation("Notion", _get_articles) or []
+    
+    def mark_articles_done(self, articles: List[Dict[str, Any]]) -> List[str]:
+        """Zmienia status artykułów z wysłanego digestu na 'Done' (wywoływane dopiero po wysyłce)."""
+        if not self.token or not self.database_id or not articles:
+            return []
+        
+        try:
+            updated_ids = self._update_article_status(articles)
+            if self.index is not None:
+                self.index.set_status(self.database_id, updated_ids, 'Done')
+            return updated_ids
+        except Exception as e:
+            # Digest został już wysłany - błąd oznaczania nie może przerwać pozostałych wysyłek
+            error_msg = f"Błąd podczas oznaczania artykułów jako przeczytane: {str(e)}"
+            logger.error(error_msg)
+            self.errors.append(error_msg)
+            return []
+    
+    def _update_article_status(self, articles: List[Dict[str, Any]]) -> List[str]:
+        """Zmienia status artykułów na 'Done' i zwraca ID stron, które udało się zaktualizować."""
+        updates = [
+            (article['name'], article['page_id'], {"Status": {"select": {"name": "Done"}}})
+            for article in articles if article.get('page_id')
+        ]
+        
+        stats = self.update_scheduler.run(updates)
+        for error_msg in stats['errors']:
+            logger.error(error_msg)
+            self.errors.append(error_msg)
+        
+        if updates:
+            logger.info(
+                f"Notion - zaktualizowano {stats['succeeded']}/{len(updates)} artykułów "
+                f"w {stats['elapsed_seconds']}s ({stats['updates_per_second']} aktualizacji/s)"
+            )
+        
+        return stats['updated_page_ids']
 
 
-class QuotesManager:
-    """Zarządza cytatami, generując je dynamicznie przez AI."""
-    
-    def __init__(self):
-        # Usunięto inicjalizację z pliku quotes.json
-        # self.quotes_file = quotes_file
-        # self.quotes = self._load_quotes()
-        self.openai_client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        pass
+class QuotePool:
+    """Pula wcześniej wygenerowanych cytatów zapisana na dysku.
 
-    # Usunięto metodę _load_quotes, ponieważ nie jest już potrzebna
-    # def _load_quotes(self) -> List[Dict[str, str]]:
-    #     """Ładuje cytaty z pliku JSON"""
-    #     try:
-    #         with open(self.quotes_file, 'r', encoding='utf-8') as f:
-    #             return json.load(f)
-    #     except FileNotFoundError:
-    #         logger.error(f"Nie znaleziono pliku {self.quotes_file}")
-    #         return []
-    #     except json.JSONDecodeError:
-    #         logger.error(f"Błąd parsowania pliku {self.quotes_file}")
-    #         return []
+    Cytaty są wydawane w O(1) (z końca listy), a indeks odcisków pilnuje, żeby ten sam cytat
+    nie trafił do puli ponownie - także po tym, jak został już wydany. Wydanie zmienia tylko stan
+    w pamięci; plik jest zapisywany raz na uruchomienie przez `flush()`, po wysłaniu digestów.
+    """
     
-    def get_random_quote(self) -> Dict[str, str]:
-        """Generuje losowy motywacyjny cytat na dziś przy użyciu AI."""
+    def __init__(self, path: str = QUOTE_POOL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._quotes, self._fingerprints = self._load()
+        self._dirty = False
+    
+    @staticmethod
+    def fingerprint(quote: Dict[str, str]) -> str:
+        """Zwraca odcisk cytatu niezależny od wielkości liter, interpunkcji i białych znaków"""
+        normalized = re.sub(r'\W+', '', quote.get('quote', '').lower())
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def is_valid(quote: Any) -> bool:
+        """Sprawdza, czy cytat ma wymagane pola z niepustą treścią"""
+        return (
+            isinstance(quote, dict)
+            and isinstance(quote.get('quote'), str) and quote['quote'].strip() != ''
+            and isinstance(quote.get('author'), str) and quote['author'].strip() != ''
+        )
+    
+    def _load(self) -> Tuple[List[Dict[str, str]], Dict[str, None]]:
+        """Wczytuje pulę z dysku"""
         try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4.1-nano", # Uwzględniono zmianę modelu dokonaną przez użytkownika
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """Jesteś ekspertem od generowania krótkich, inspirujących cytatów. 
-                                    Odpowiedz tylko samym cytatem, jego autorem i źródłem (autor i źródło mają być autentyczne).
-                                    Format odpowiedzi powinien być JSON: {"quote": "Treść cytatu", "author": "Autor cytatu", "source": "Źródło/Książka"}."""
-                    },
-                    {
-                        "role": "user",
-                        "content": "Podaj mi motywacyjny cytat na dzisiejszy dzień."
-                    }
-                ],
-                max_tokens=150,
-                temperature=0.8
-            )
-            
-            quote_data_str = response.choices[0].message.content.strip()
-            
-            # Próba sparsowania JSONa
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data.get('quotes', []), dict.fromkeys(data.get('fingerprints', []))
+        except FileNotFoundError:
+            return [], {}
+        except (OSError, ValueError) as e:
+            logger.error(f"Błąd wczytywania puli cytatów {self.path}: {e}")
+            return [], {}
+    
+    def _save(self) -> None:
+        """Zapisuje pulę na dysk (atomowo)"""
+        # Pamiętamy tylko ostatnie odciski, żeby plik nie rósł bez końca
+        fingerprints = list(self._fingerprints)[-QUOTE_POOL_HISTORY_SIZE:]
+        self._fingerprints = dict.fromkeys(fingerprints)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'quotes': self._quotes, 'fingerprints': fingerprints}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+    
+    def size(self) -> int:
+        """Zwraca liczbę cytatów dostępnych w puli"""
+        with self._lock:
+            return len(self._quotes)
+    
+    def take(self) -> Optional[Dict[str, str]]:
+        """Wydaje jeden cytat z puli (lub None, jeśli pula jest pusta); na dysk trafia dopiero przy flush()"""
+        with self._lock:
+            if not self._quotes:
+                return None
+            self._dirty = True
+            return self._quotes.pop()
+    
+    def flush(self) -> None:
+        """Zapisuje pulę na dysk, jeśli od ostatniego zapisu wydano z niej cytaty"""
+        with self._lock:
+            if not self._dirty:
+                return
             try:
-                quote_data = json.loads(quote_data_str)
-                if isinstance(quote_data, dict) and 'quote' in quote_data and 'author' in quote_data:
-                    # Upewnij się, że source istnieje, nawet jeśli jest pusty
-                    quote_data.setdefault('source', 'Nieznane źródło') 
-                    logger.info(f"Wygenerowano cytat AI: \"{quote_data['quote']}\" - {quote_data['author']}")
-                    return quote_data
-                else:
-                    logger.warning(f"AI zwróciło niepoprawny format JSON dla cytatu: {quote_data_str}")
-            except json.JSONDecodeError:
-                logger.warning(f"Nie udało się sparsować JSON z odpowiedzi AI dla cytatu: {quote_data_str}")
+                self._save()
+            except OSError as e:
+                logger.warning(f"Nie udało się zapisać puli cytatów: {e}")
+    
+    def add(self, quotes: List[Any]) -> int:
+        """Dodaje poprawne i nowe cytaty do puli, zwraca liczbę dodanych"""
+        added = 0
+        with self._lock:
+            for quote in quotes:
+                if not self.is_valid(quote):
+                    logger.warning(f"Pominięto niepoprawny cytat: {quote}")
+                    continue
+                fingerprint = self.fingerprint(quote)
+                if fingerprint in self._fingerprints:
+                    continue
+                self._fingerprints[fingerprint] = None
+                self._quotes.append({
+                    'quote': quote['quote'].strip(),
+                    'author': quote['author'].strip(),
+                    'source': (quote.get('source') or 'Nieznane źródło').strip()
+                })
+                added += 1
+            # Nowe cytaty na początek, żeby najpierw wydawać starsze
+            if added:
+                self._quotes = self._quotes[-added:] + self._quotes[:-added]
+                self._save()
+        return added
 
-            # Jeśli AI nie zwróciło poprawnego JSONa, spróbuj wyciągnąć dane heurystycznie
-            # (To jest uproszczone, można by tu dodać bardziej zaawansowane parsowanie)
-            # Na razie, jeśli JSON się nie powiedzie, użyjemy domyślnego.
 
-        except Exception as e:
-            logger.error(f"Błąd podczas generowania cytatu przez AI: {e}")
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+
+def get_openai_client() -> 'openai.OpenAI':
+    """Zwraca współdzielonego klienta OpenAI (jedna pula połączeń dla cytatów i treści AI)"""
+    global _openai_client
+    with _openai_client_lock:
+        if _openai_client is None:
+            _openai_client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        return _openai_client
+
+
+_quote_pools: Dict[str, QuotePool] = {}
+_quote_pools_lock = threading.Lock()
+_quote_refill_lock = threading.Lock()
 
-        # Domyślny cytat w przypadku błędu lub niepoprawnej odpowiedzi AI
+
+def get_quote_pool(path: str = QUOTE_POOL_PATH) -> QuotePool:
+    """Zwraca współdzieloną pulę cytatów dla danego pliku"""
+    with _quote_pools_lock:
+        if path not in _quote_pools:
+            _quote_pools[path] = QuotePool(path)
+        return _quote_pools[path]
+
+
+class QuotesManager:
+    """Zarządza cytatami: wydaje je z puli wygenerowanej wcześniej przez AI, z awaryjnym quotes.json."""
+    
+    def __init__(self, pool: Optional[QuotePool] = None):
+        self.quotes_file = QUOTES_FILE
+        self.quotes = self._load_quotes()
+        self.pool = pool or get_quote_pool()
+    
+    @property
+    def openai_client(self) -> 'openai.OpenAI':
+        """Klient OpenAI tworzony dopiero przy generowaniu cytatów - wydanie cytatu z puli nie importuje openai"""
+        return get_openai_client()
+    
+    def _load_quotes(self) -> List[Dict[str, str]]:
+        """Ładuje cytaty z pliku JSON"""
+        try:
+            with open(self.quotes_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            logger.error(f"Nie znaleziono pliku {self.quotes_file}")
+            return []
+        except json.JSONDecodeError:
+            logger.error(f"Błąd parsowania pliku {self.quotes_file}")
+            return []
+    
+    def generate_quotes(self, count: int = QUOTE_POOL_BATCH_SIZE) -> List[Dict[str, str]]:
+        """Generuje partię motywacyjnych cytatów jednym zapytaniem do AI."""
+        response = self.openai_client.chat.completions.create(
+            model="gpt-4.1-nano", # Uwzględniono zmianę modelu dokonaną przez użytkownika
+            messages=[
+                {
+                    "role": "system",
+                    "content": """Jesteś ekspertem od generowania krótkich, inspirujących cytatów. 
+                                Podawaj tylko cytaty, ich autorów i źródła (autor i źródło mają być autentyczne).
+                                Format odpowiedzi powinien być JSON: {"quotes": [{"quote": "Treść cytatu", "author": "Autor cytatu", "source": "Źródło/Książka"}]}."""
+                },
+                {
+                    "role": "user",
+                    "content": f"Podaj mi {count} różnych motywacyjnych cytatów na kolejne dni."
+                }
+            ],
+            max_tokens=150 * count,
+            temperature=0.8,
+            response_format={"type": "json_object"}
+        )
+        
+        quote_data = json.loads(response.choices[0].message.content.strip())
+        quotes = quote_data.get('quotes', []) if isinstance(quote_data, dict) else []
+        if not isinstance(quotes, list):
+            raise DailyDigestError(f"AI zwróciło niepoprawny format listy cytatów: {quote_data}")
+        return quotes
+    
+    def refill_pool(self, count: int = QUOTE_POOL_BATCH_SIZE) -> int:
+        """Uzupełnia pulę cytatów nową partią z AI, zwraca liczbę dodanych cytatów"""
+        try:
+            added = self.pool.add(self.generate_quotes(count))
+            logger.info(f"Dodano {added} nowych cytatów do puli (w puli: {self.pool.size()})")
+            return added
+        except Exception as e:
+            logger.error(f"Błąd podczas uzupełniania puli cytatów: {e}")
+            return 0
+    
+    def _refill_in_background(self) -> None:
+        """Uruchamia uzupełnianie puli w tle (najwyżej jedno naraz w procesie)"""
+        if not _quote_refill_lock.acquire(blocking=False):
+            return
+        
+        def _refill():
+            try:
+                self.refill_pool()
+            finally:
+                _quote_refill_lock.release()
+        
+        threading.Thread(target=_refill, name='quote-pool-refill').start()
+    
+    def get_random_quote(self) -> Dict[str, str]:
+        """Zwraca cytat na dziś z puli bez czekania na AI."""
+        quote = self.pool.take()
+        if self.pool.size() < QUOTE_POOL_MIN_SIZE:
+            self._refill_in_background()
+        
+        if quote:
+            logger.info(f"Cytat z puli: \"{quote['quote']}\" - {quote['author']}")
+            return quote
+        
+        if self.quotes:
+            logger.warning("Pula cytatów jest pusta - używam cytatu z pliku quotes.json.")
+            return random.choice(self.quotes)
+        
+        # Domyślny cytat, gdy nie ma ani puli, ani pliku z cytatami
         logger.warning("Używam domyślnego cytatu z powodu problemu z AI.")
         return {
             'quote': 'Każdy dzień to nowa szansa, aby być lepszym niż wczoraj.',
@@ -437,41 +1914,296 @@ class QuotesManager:
         }
 
 
+class CompletionCache:
+    """Cache odpowiedzi modelu adresowany skrótem znormalizowanego promptu, modelu i temperatury"""
+    
+    def __init__(self, backend: Any):
+        # Backend: MemoryCache lub DiskCache (ten sam interfejs get/set/stats)
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, threading.Event] = {}
+    
+    @staticmethod
+    def make_key(messages: List[Dict[str, str]], model: str, temperature: float) -> str:
+        """Tworzy klucz niezależny od białych znaków w treści wiadomości"""
+        normalized_messages = [
+            {'role': message['role'], 'content': ' '.join(message['content'].split())} for message in messages
+        ]
+        payload = json.dumps(
+            {'model': model, 'temperature': temperature, 'messages': normalized_messages},
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, messages: List[Dict[str, str]], model: str, temperature: float) -> Optional[str]:
+        """Zwraca zapisaną odpowiedź lub None"""
+        return self.backend.get(self.make_key(messages, model, temperature))
+    
+    def set(self, messages: List[Dict[str, str]], model: str, temperature: float, completion: str) -> None:
+        """Zapisuje odpowiedź modelu"""
+        self.backend.set(self.make_key(messages, model, temperature), completion)
+    
+    @contextmanager
+    def single_flight(self, messages: List[Dict[str, str]], model: str, temperature: float) -> Iterator[Optional[str]]:
+        """Zwraca zapisaną odpowiedź; gdy ten sam prompt generuje już inny wątek, najpierw czeka na jego wynik.
+
+        Wątek, który dostał None, generuje odpowiedź sam - pozostali z tym samym kluczem czekają do wyjścia z bloku.
+        """
+        key = self.make_key(messages, model, temperature)
+        with self._lock:
+            event = self._in_flight.get(key)
+            is_owner = event is None
+            if is_owner:
+                self._in_flight[key] = threading.Event()
+        if not is_owner:
+            event.wait()
+        try:
+            yield self.backend.get(key)
+        finally:
+            if is_owner:
+                with self._lock:
+                    self._in_flight.pop(key).set()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca liczniki trafień backendu"""
+        return self.backend.stats()
+
+
+_completion_cache = None
+_completion_cache_lock = threading.Lock()
+
+
+def get_completion_cache() -> Optional[CompletionCache]:
+    """Zwraca współdzielony cache odpowiedzi AI (None, gdy AI_CACHE_BACKEND=off)"""
+    global _completion_cache
+    with _completion_cache_lock:
+        if _completion_cache is None and AI_CACHE_BACKEND != 'off':
+            if AI_CACHE_BACKEND == 'disk':
+                backend = get_disk_cache('completions', AI_CACHE_TTL, AI_CACHE_MAX_ENTRIES)
+            else:
+                backend = MemoryCache(AI_CACHE_TTL, AI_CACHE_MAX_ENTRIES)
+            _completion_cache = CompletionCache(backend)
+        return _completion_cache
+
+
+# Schemat odpowiedzi trybu łączonego: wprowadzenie i cytat dnia w jednym zapytaniu
+DIGEST_TEXT_SCHEMA = {
+    "name": "daily_digest_text",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "intro": {"type": "string"},
+            "quote": {
+                "type": "object",
+                "properties": {
+                    "quote": {"type": "string"},
+                    "author": {"type": "string"},
+                    "source": {"type": "string"}
+                },
+                "required": ["quote", "author", "source"],
+                "additionalProperties": False
+            }
+        },
+        "required": ["intro", "quote"],
+        "additionalProperties": False
+    }
+}
+
+
 class AIContentGenerator:
     """Generuje spersonalizowaną treść przy użyciu AI"""
     
+    model = "gpt-4.1-nano"
+    temperature = 0.7
+    
     def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.client = get_openai_client()
+        self.cache = get_completion_cache()
+        # Czasy ostatniego generowania (czas do pierwszego tokenu, czas całkowity, czy ucięto)
+        self.last_run_metrics: Dict[str, Any] = {}
+    
+    def _create_messages(self, data: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Tworzy wiadomości (system + prompt) dla modelu"""
+        prompt = self._create_prompt(data)
+        language_name = LANGUAGE_NAMES.get(data.get('language', DEFAULT_LANGUAGE), data.get('language'))
+        
+        return [
+            {
+                "role": "system",
+                "content": f"""Jesteś asystentem do tworzenia codziennych podsumowań. 
+                Twoim zadaniem jest stworzenie przyjaznego, ale profesjonalnego podsumowania dnia w języku {language_name}.
+                Używaj luźnego, ale nie przesadnie potocznego tonu. 
+                Bądź pomocny i motywujący. Nie dodawaj zbędnych znaczników HTML - zostanie to użyte w szablonie HTML. Nie dodawaj cytatu w podsumowaniu."""
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
     
     def generate_personalized_content(self, data: Dict[str, Any]) -> str:
         """Generuje spersonalizowaną treść na podstawie danych"""
         try:
-            prompt = self._create_prompt(data)
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4.1-nano",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """Jesteś asystentem do tworzenia codziennych podsumowań. 
-                        Twoim zadaniem jest stworzenie przyjaznego, ale profesjonalnego podsumowania dnia w języku polskim.
-                        Używaj luźnego, ale nie przesadnie potocznego tonu. 
-                        Bądź pomocny i motywujący. Nie dodawaj zbędnych znaczników HTML - zostanie to użyte w szablonie HTML. Nie dodawaj cytatu w podsumowaniu."""
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=1000,
-                temperature=0.7
-            )
+            messages = self._create_messages(data)
             
-            return response.choices[0].message.content.strip()
+            # Identyczne dane wejściowe (np. inny użytkownik z tym samym dniem) nie wymagają nowego zapytania;
+            # równoległe wątki z tym samym promptem czekają na jedno zapytanie zamiast wysyłać własne
+            flight = nullcontext()
+            if self.cache is not None:
+                flight = self.cache.single_flight(messages, self.model, self.temperature)
+            with flight as cached:
+                if cached is not None:
+                    logger.info("Treść AI pobrana z cache")
+                    return cached
+                
+                with get_run_metrics().span('api_call', host='api.openai.com'):
+                    if AI_STREAMING:
+                        content, truncated = self._stream_completion(messages)
+                    else:
+                        start = time.monotonic()
+                        response = self.client.chat.completions.create(
+                            model=self.model,
+                            messages=messages,
+                            max_tokens=1000,
+                            temperature=self.temperature
+                        )
+                        content, truncated = response.choices[0].message.content.strip(), False
+                        self.last_run_metrics = {'total_time': round(time.monotonic() - start, 3), 'truncated': False}
+                if self.last_run_metrics.get('time_to_first_token') is not None:
+                    get_run_metrics().record_span('ai_first_token', self.last_run_metrics['time_to_first_token'])
+                
+                # Ucięte wprowadzenie trafia do e-maila, ale nie do cache
+                if self.cache is not None and not truncated:
+                    self.cache.set(messages, self.model, self.temperature, content)
+                return content
         
         except Exception as e:
             logger.error(f"Błąd podczas generowania treści AI: {e}")
-            return "Przepraszam, nie udało się wygenerować spersonalizowanej treści. Oto Twoje dane na dziś."
+            return AI_FALLBACK_INTRO
+    
+    @staticmethod
+    def _cut_at_sentence_boundary(text: str) -> str:
+        """Przycina tekst do ostatniego pełnego zdania"""
+        match = None
+        for match in re.finditer(r'[.!?…](?=\s|$)', text):
+            pass
+        if match is None:
+            return text.rstrip() + '…'
+        return text[:match.end()]
+    
+    def _stream_completion(self, messages: List[Dict[str, str]]) -> Tuple[str, bool]:
+        """Generuje odpowiedź strumieniowo w ramach budżetu czasu AI_LATENCY_BUDGET.
+
+        Zwraca (tekst, czy_ucięto). Po przekroczeniu budżetu zwracana jest część odpowiedzi
+        przycięta do ostatniego pełnego zdania.
+        """
+        start = time.monotonic()
+        deadline = start + AI_LATENCY_BUDGET
+        chunks: queue.Queue = queue.Queue()
+        stream = self.client.with_options(timeout=AI_LATENCY_BUDGET).chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=1000,
+            temperature=self.temperature,
+            stream=True
+        )
+        
+        def _consume():
+            # Odczyt strumienia w osobnym wątku, żeby budżet czasu obowiązywał także przy "zawieszonym" strumieniu
+            try:
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        chunks.put(chunk.choices[0].delta.content)
+            except Exception as e:
+                chunks.put(e)
+            chunks.put(None)
+        
+        threading.Thread(target=_consume, name='ai-stream', daemon=True).start()
+        
+        parts = []
+        first_token_at = None
+        truncated = False
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                item = chunks.get(timeout=max(remaining, 0))
+            except queue.Empty:
+                truncated = True
+                break
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                if not parts:
+                    raise item
+                logger.warning(f"Przerwany strumień odpowiedzi AI: {item}")
+                truncated = True
+                break
+            if first_token_at is None:
+                first_token_at = time.monotonic()
+            parts.append(item)
+        
+        if truncated:
+            try:
+                stream.close()
+            except Exception:
+                pass
+        
+        content = ''.join(parts).strip()
+        if not content:
+            raise DailyDigestError(f"Brak odpowiedzi AI w budżecie {AI_LATENCY_BUDGET:g}s")
+        if truncated:
+            content = self._cut_at_sentence_boundary(content)
+        
+        self.last_run_metrics = {
+            'time_to_first_token': round(first_token_at - start, 3) if first_token_at else None,
+            'total_time': round(time.monotonic() - start, 3),
+            'truncated': truncated
+        }
+        logger.info(
+            f"Treść AI (strumień): pierwszy token po {self.last_run_metrics['time_to_first_token']}s, "
+            f"całość {self.last_run_metrics['total_time']}s{', ucięta po budżecie czasu' if truncated else ''}"
+        )
+        return content, truncated
+    
+    def generate_intro_and_quote(self, data: Dict[str, Any]) -> Tuple[str, Dict[str, str]]:
+        """Generuje wprowadzenie i cytat dnia jednym zapytaniem ze ściśle walidowaną odpowiedzią JSON.
+
+        Rzuca wyjątek, gdy odpowiedź nie spełnia schematu - wtedy należy użyć osobnych ścieżek.
+        """
+        messages = self._create_messages(dict(data, generate_quote=True))
+        messages[0]['content'] += """
+                Dodatkowo dobierz jeden krótki, inspirujący cytat na dziś (autor i źródło mają być autentyczne).
+                Odpowiedz w formacie JSON: {"intro": "Wprowadzenie", "quote": {"quote": "Treść cytatu", "author": "Autor cytatu", "source": "Źródło/Książka"}}."""
+        
+        # Równoległe wątki z tym samym promptem czekają na jedno zapytanie (jak w generate_personalized_content)
+        flight = nullcontext()
+        if self.cache is not None:
+            flight = self.cache.single_flight(messages, self.model, self.temperature)
+        with flight as content:
+            if content is None:
+                with get_run_metrics().span('api_call', host='api.openai.com'):
+                    response = self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        max_tokens=1150,
+                        temperature=self.temperature,
+                        response_format={"type": "json_schema", "json_schema": DIGEST_TEXT_SCHEMA}
+                    )
+                content = response.choices[0].message.content.strip()
+            
+            result = json.loads(content)
+            intro = result.get('intro') if isinstance(result, dict) else None
+            quote = result.get('quote') if isinstance(result, dict) else None
+            if not isinstance(intro, str) or not intro.strip() or not QuotePool.is_valid(quote):
+                raise DailyDigestError(f"AI zwróciło odpowiedź niezgodną ze schematem: {content}")
+            
+            if self.cache is not None:
+                self.cache.set(messages, self.model, self.temperature, content)
+        
+        quote.setdefault('source', 'Nieznane źródło')
+        logger.info(f"Wygenerowano wprowadzenie i cytat AI: \"{quote['quote']}\" - {quote['author']}")
+        return intro.strip(), quote
     
     def _create_prompt(self, data: Dict[str, Any]) -> str:
         """Tworzy prompt dla AI na podstawie danych"""
@@ -479,6 +2211,7 @@ class AIContentGenerator:
         weather = data.get('weather', {})
         articles = data.get('articles', [])
         quote = data.get('quote', {})
+        language_name = LANGUAGE_NAMES.get(data.get('language', DEFAULT_LANGUAGE), data.get('language'))
         
         # Przygotuj informacje o pogodzie
         weather_info = "brak danych"
@@ -491,14 +2224,19 @@ class AIContentGenerator:
                 if summary.get('min_temp') != summary.get('max_temp'):
                     weather_info += f" (dziś {summary.get('min_temp', 'N/A')}°C - {summary.get('max_temp', 'N/A')}°C)"
         
+        if data.get('generate_quote'):
+            quote_info = "dobierz sam i zwróć go osobno (nie umieszczaj go we wprowadzeniu)"
+        else:
+            quote_info = f"\"{quote.get('quote', 'Brak cytatu')}\" - {quote.get('author', 'Nieznany')}"
+        
         prompt = f"""
-        Stwórz krótkie (2-3 zdania), przyjazne wprowadzenie do dzisiejszego dnia w języku polskim.
+        Stwórz krótkie (2-3 zdania), przyjazne wprowadzenie do dzisiejszego dnia w języku {language_name}.
         Weź pod uwagę:
         
         Wydarzenia na dziś: {len(events)} wydarzeń zaplanowanych
         Pogoda: {weather_info}
         Artykuły do przeczytania: {len(articles)} artykułów
-        Cytat dnia: "{quote.get('quote', 'Brak cytatu')}" - {quote.get('author', 'Nieznany')}
+        Cytat dnia: {quote_info}
         
         Stwórz motywujące wprowadzenie, które łączy te elementy w spójną całość.
         """
@@ -506,50 +2244,725 @@ class AIContentGenerator:
         return prompt
 
 
+class OpenAIBatchPipeline:
+    """Generuje wprowadzenia AI dla wielu użytkowników jednym zadaniem OpenAI Batch API.
+
+    Wszystkie prompty trafiają do jednego pliku JSONL, zadanie jest odpytywane do zakończenia
+    (lub upływu limitu czasu), a wyniki wracają do użytkowników po `custom_id`. Użytkownicy bez
+    poprawnego wyniku dostają statyczne wprowadzenie.
+    """
+    
+    FINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+    
+    def __init__(self, ai_generator: AIContentGenerator, poll_interval: float = AI_BATCH_POLL_INTERVAL,
+                 timeout: float = AI_BATCH_TIMEOUT):
+        self.ai_generator = ai_generator
+        self.client = ai_generator.client
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+    
+    def build_job_file(self, messages_by_id: Dict[str, List[Dict[str, str]]]) -> bytes:
+        """Tworzy plik JSONL z zapytaniami chat.completions dla każdego użytkownika"""
+        lines = []
+        for custom_id, messages in messages_by_id.items():
+            lines.append(json.dumps({
+                'custom_id': custom_id,
+                'method': 'POST',
+                'url': '/v1/chat/completions',
+                'body': {
+                    'model': self.ai_generator.model,
+                    'messages': messages,
+                    'max_tokens': 1000,
+                    'temperature': self.ai_generator.temperature
+                }
+            }, ensure_ascii=False))
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+    
+    def submit(self, job_file: bytes) -> str:
+        """Wysyła plik zadania i tworzy batch, zwraca jego ID"""
+        input_file = self.client.files.create(file=('daily_digest_batch.jsonl', job_file), purpose='batch')
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint='/v1/chat/completions',
+            completion_window='24h'
+        )
+        logger.info(f"Utworzono zadanie OpenAI Batch {batch.id}")
+        return batch.id
+    
+    def wait(self, batch_id: str) -> Any:
+        """Odpytuje zadanie aż do zakończenia; po przekroczeniu limitu czasu anuluje je"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in self.FINAL_STATUSES:
+                logger.info(f"Zadanie OpenAI Batch {batch_id} zakończone ze statusem {batch.status}")
+                return batch
+            if time.monotonic() >= deadline:
+                logger.warning(f"Zadanie OpenAI Batch {batch_id} nie zakończyło się w {self.timeout:.0f}s - anuluję")
+                try:
+                    return self.client.batches.cancel(batch_id)
+                except Exception as e:
+                    logger.warning(f"Nie udało się anulować zadania {batch_id}: {e}")
+                    return batch
+            time.sleep(self.poll_interval)
+    
+    def collect(self, batch: Any) -> Dict[str, str]:
+        """Odczytuje udane odpowiedzi z pliku wyników zadania"""
+        if not getattr(batch, 'output_file_id', None):
+            return {}
+        
+        completions = {}
+        output = self.client.files.content(batch.output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            try:
+                result = json.loads(line)
+                response = result.get('response') or {}
+                if response.get('status_code') != 200:
+                    logger.warning(f"Batch - błąd dla {result.get('custom_id')}: {result.get('error') or response}")
+                    continue
+                content = response['body']['choices'][0]['message']['content'].strip()
+                if content:
+                    completions[result['custom_id']] = content
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                logger.warning(f"Batch - niepoprawna linia wyników: {e}")
+        return completions
+    
+    def run(self, data_by_id: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        """Zwraca wprowadzenie dla każdego użytkownika (z cache, z zadania batch lub statyczne)"""
+        cache = self.ai_generator.cache
+        messages_by_id = {custom_id: self.ai_generator._create_messages(data) for custom_id, data in data_by_id.items()}
+        intros = {}
+        
+        # Prompty, które już znamy, nie trafiają do zadania, a identyczne prompty trafiają do niego raz
+        pending = {}
+        duplicates = {}  # custom_id -> custom_id zapytania z tym samym promptem
+        pending_keys = {}
+        for custom_id, messages in messages_by_id.items():
+            cached = cache.get(messages, self.ai_generator.model, self.ai_generator.temperature) if cache else None
+            if cached is not None:
+                intros[custom_id] = cached
+                continue
+            key = CompletionCache.make_key(messages, self.ai_generator.model, self.ai_generator.temperature)
+            if key in pending_keys:
+                duplicates[custom_id] = pending_keys[key]
+            else:
+                pending_keys[key] = custom_id
+                pending[custom_id] = messages
+        
+        if pending:
+            try:
+                batch = self.wait(self.submit(self.build_job_file(pending)))
+                completions = self.collect(batch)
+            except Exception as e:
+                logger.error(f"Błąd zadania OpenAI Batch: {e}")
+                completions = {}
+            
+            for custom_id, messages in pending.items():
+                if custom_id in completions:
+                    intros[custom_id] = completions[custom_id]
+                    if cache is not None:
+                        cache.set(messages, self.ai_generator.model, self.ai_generator.temperature, completions[custom_id])
+                else:
+                    intros[custom_id] = AI_FALLBACK_INTRO
+            for custom_id, original_id in duplicates.items():
+                intros[custom_id] = intros[original_id]
+            
+            logger.info(f"OpenAI Batch: {len(completions)}/{len(pending)} wprowadzeń wygenerowanych "
+                        f"({len(duplicates)} odbiorców z identycznym promptem)")
+        
+        return intros
+
+
+class SMTPConnectionPool:
+    """Pula uwierzytelnionych połączeń SMTP współdzielonych przez wiele wiadomości.
+
+    Połączenia są otwierane leniwie (maksymalnie `size` naraz), wracają do puli po wysłaniu
+    wiadomości i są odtwarzane, jeśli serwer je zamknie.
+    """
+    
+    # Błędy dotyczące wiadomości, nie połączenia (SMTPRecipientsRefused nie dziedziczy po SMTPResponseException)
+    MESSAGE_ERRORS = (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+    
+    def __init__(self, server: str, port: int, email: Optional[str], password: Optional[str],
+                 size: int = SMTP_POOL_SIZE, use_tls: bool = SMTP_USE_TLS):
+        self.server = server
+        self.port = port
+        self.email = email
+        self.password = password
+        self.use_tls = use_tls
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(size, 1))
+        self._lock = threading.Lock()
+        self._started_at = None
+        self.messages_sent = 0
+        self.messages_failed = 0
+        self.connections_opened = 0
+        self.reconnects = 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def _connect(self) -> smtplib.SMTP:
+        """Otwiera i uwierzytelnia nowe połączenie SMTP"""
+        connection = smtplib.SMTP(self.server, self.port, timeout=30)
+        try:
+            if self.use_tls:
+                connection.starttls()
+            # Lokalne serwery testowe często nie wymagają logowania
+            if self.email and self.password:
+                connection.login(self.email, self.password)
+        except Exception:
+            self._discard(connection)
+            raise
+        
+        with self._lock:
+            self.connections_opened += 1
+        return connection
+    
+    @staticmethod
+    def _discard(connection: smtplib.SMTP) -> None:
+        """Zamyka połączenie, ignorując błędy (np. gdy serwer już je zerwał)"""
+        try:
+            connection.quit()
+        except Exception:
+            try:
+                connection.close()
+            except Exception:
+                pass
+    
+    def send(self, msg: MIMEMultipart) -> None:
+        """Wysyła wiadomość używając połączenia z puli"""
+        with self._slots:
+            with self._lock:
+                if self._started_at is None:
+                    self._started_at = time.monotonic()
+            
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = None
+            
+            try:
+                if connection is None:
+                    connection = self._connect()
+                try:
+                    connection.send_message(msg)
+                except self.MESSAGE_ERRORS:
+                    raise
+                except OSError:
+                    # Połączenie z puli wygasło po stronie serwera - otwórz nowe i ponów raz
+                    self._discard(connection)
+                    connection = None
+                    with self._lock:
+                        self.reconnects += 1
+                    connection = self._connect()
+                    connection.send_message(msg)
+            except self.MESSAGE_ERRORS:
+                # Błąd dotyczy wiadomości, nie połączenia - po RSET połączenie nadaje się do ponownego użycia
+                with self._lock:
+                    self.messages_failed += 1
+                if connection is not None:
+                    try:
+                        connection.rset()
+                        self._idle.put(connection)
+                    except Exception:
+                        self._discard(connection)
+                raise
+            except Exception:
+                with self._lock:
+                    self.messages_failed += 1
+                if connection is not None:
+                    self._discard(connection)
+                raise
+            
+            with self._lock:
+                self.messages_sent += 1
+            self._idle.put(connection)
+    
+    def close(self) -> None:
+        """Zamyka wszystkie bezczynne połączenia"""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Zwraca statystyki wysyłki (w tym liczbę wiadomości na sekundę)"""
+        with self._lock:
+            elapsed = time.monotonic() - self._started_at if self._started_at is not None else 0.0
+            return {
+                'messages_sent': self.messages_sent,
+                'messages_failed': self.messages_failed,
+                'connections_opened': self.connections_opened,
+                'reconnects': self.reconnects,
+                'elapsed_seconds': round(elapsed, 3),
+                'messages_per_second': round(self.messages_sent / elapsed, 2) if elapsed > 0 else 0.0
+            }
+
+
+# Mapowanie ikon pogodowych na emoji
+WEATHER_ICONS = {
+    '01d': '☀️', '01n': '🌙',  # clear sky
+    '02d': '⛅', '02n': '☁️',  # few clouds
+    '03d': '☁️', '03n': '☁️',  # scattered clouds
+    '04d': '☁️', '04n': '☁️',  # broken clouds
+    '09d': '🌧️', '09n': '🌧️',  # shower rain
+    '10d': '🌦️', '10n': '🌧️',  # rain
+    '11d': '⛈️', '11n': '⛈️',  # thunderstorm
+    '13d': '❄️', '13n': '❄️',  # snow
+    '50d': '🌫️', '50n': '🌫️'   # mist
+}
+DEFAULT_WEATHER_ICON = '🌤️'
+
+# Style inline sekcji e-maila (klienci pocztowi często ignorują arkusze CSS)
+STYLE_EMPTY = 'color: #666;'
+STYLE_CARD = 'margin-bottom: 15px; padding: 10px; background-color: #f8f9fa; border-radius: 8px;'
+STYLE_PANEL = 'background-color: #f8f9fa; padding: 15px; border-radius: 8px;'
+STYLE_EVENT_TIME = 'font-weight: 600; color: #007AFF;'
+STYLE_EVENT_TITLE = 'font-weight: 500; margin-top: 5px;'
+STYLE_EVENT_LOCATION = 'color: #666; font-size: 14px; margin-top: 3px;'
+STYLE_EVENT_CALENDAR = 'color: #777; font-size: 12px; margin-top: 2px;'
+STYLE_WEATHER_HEADER = 'display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px;'
+STYLE_WEATHER_CITY = 'font-size: 18px; font-weight: 600; color: #007AFF;'
+STYLE_WEATHER_SUMMARY = 'font-size: 14px; color: #666; margin-top: 2px;'
+STYLE_FORECAST_ROW = 'display: flex; overflow-x: auto; gap: 15px; padding: 10px 0;'
+STYLE_FORECAST_TILE = ('min-width: 80px; text-align: center; background-color: white; padding: 12px 8px; '
+                       'border-radius: 8px; border: 1px solid #e0e0e0; box-shadow: 0 1px 3px rgba(0,0,0,0.1);')
+STYLE_FORECAST_TIME = 'font-weight: 600; font-size: 14px; color: #333; margin-bottom: 8px;'
+STYLE_FORECAST_ICON = 'font-size: 24px; margin: 8px 0;'
+STYLE_FORECAST_DESCRIPTION = 'font-size: 12px; color: #666; margin-bottom: 4px; line-height: 1.2;'
+STYLE_FORECAST_TEMP = 'font-weight: 600; font-size: 16px; color: #333; margin: 6px 0;'
+STYLE_FORECAST_FEELS_LIKE = 'font-size: 11px; color: #999;'
+STYLE_FORECAST_RAIN = 'color: #007AFF; font-size: 11px; margin-top: 2px;'
+STYLE_FORECAST_WIND = 'font-size: 10px; color: #999; margin-top: 4px;'
+STYLE_WEEK_TITLE = 'font-size: 14px; font-weight: 600; color: #333; margin-top: 15px;'
+STYLE_ARTICLE_TITLE = 'font-weight: 500;'
+STYLE_ARTICLE_LINK = 'color: #007AFF; text-decoration: none;'
+STYLE_ARTICLE_AUTHOR = 'color: #666; font-size: 14px; margin-top: 3px;'
+STYLE_QUOTE_PANEL = 'background-color: #f8f9fa; padding: 20px; border-radius: 8px; border-left: 4px solid #007AFF;'
+STYLE_QUOTE_TEXT = 'font-style: italic; font-size: 16px; margin-bottom: 10px;'
+STYLE_QUOTE_AUTHOR = 'font-weight: 500; color: #666;'
+STYLE_QUOTE_SOURCE = 'font-size: 14px; color: #999; margin-top: 5px;'
+STYLE_ERRORS_PANEL = 'background-color: #fff3cd; border: 1px solid #ffeaa7; padding: 15px; border-radius: 8px; margin-top: 20px;'
+STYLE_ERRORS_TITLE = 'margin: 0 0 10px 0; color: #856404;'
+STYLE_ERROR_LINE = 'color: #856404; font-size: 14px; margin-bottom: 5px;'
+
+
+class HTMLWriter:
+    """Bufor fragmentów HTML łączonych jednym `''.join` (bez kopiowania całego tekstu przy każdym dopisaniu)"""
+    
+    def __init__(self):
+        self._parts: List[str] = []
+    
+    def write(self, *parts: str):
+        """Dopisuje gotowe fragmenty HTML (bez kodowania - tylko dla znaczników, nie dla danych)"""
+        self._parts.extend(parts)
+    
+    def element(self, tag: str, style: str, *children: str, **attributes: str):
+        """Dopisuje element `<tag atrybuty style="...">dzieci</tag>`; dzieci i atrybuty są kodowane jako tekst"""
+        attrs = ''.join(f' {name}="{html.escape(str(value), quote=True)}"' for name, value in attributes.items())
+        self._parts.append(f'<{tag}{attrs} style="{style}">')
+        self._parts.extend(html.escape(str(child), quote=False) for child in children)
+        self._parts.append(f'</{tag}>')
+    
+    def getvalue(self) -> str:
+        return ''.join(self._parts)
+
+
+def render_empty_section(message: str) -> str:
+    """Komunikat dla pustej sekcji"""
+    return f'<p style="{STYLE_EMPTY}">{message}</p>'
+
+
+def write_event_card(out: HTMLWriter, event: Dict[str, Any]):
+    """Dopisuje kartę pojedynczego wydarzenia"""
+    out.write(f'<div style="{STYLE_CARD}">')
+    out.element('div', STYLE_EVENT_TIME, event['time'])
+    out.element('div', STYLE_EVENT_TITLE, event['title'])
+    if event.get('location'):
+        out.element('div', STYLE_EVENT_LOCATION, '📍 ', event['location'])
+    # Dodaj informację o kalendarzu, jeśli jest dostępna i nie jest 'primary'
+    if 'calendar_name' in event and event['calendar_name'] != 'primary':
+        out.element('div', STYLE_EVENT_CALENDAR, 'Kalendarz: ', event['calendar_name'])
+    out.write('</div>\n')
+
+
+def write_forecast_tile(out: HTMLWriter, forecast: Dict[str, Any]):
+    """Dopisuje kafelek prognozy dla jednego przedziału czasu"""
+    out.write(f'<div style="{STYLE_FORECAST_TILE}">')
+    out.element('div', STYLE_FORECAST_TIME, str(forecast['time']))
+    out.element('div', STYLE_FORECAST_ICON, WEATHER_ICONS.get(forecast.get('icon', ''), DEFAULT_WEATHER_ICON))
+    out.element('div', STYLE_FORECAST_DESCRIPTION, forecast['description'])
+    out.element('div', STYLE_FORECAST_TEMP, f"{forecast['temperature']}°C")
+    out.element('div', STYLE_FORECAST_FEELS_LIKE, f"Odczuwalnie {forecast['feels_like']}°C")
+    if forecast.get('rain_probability', 0) > 0:
+        out.element('div', STYLE_FORECAST_RAIN, f"💧 {forecast['rain_probability']}%")
+    out.element('div', STYLE_FORECAST_WIND, f"💨 {forecast['wind_speed']} m/s")
+    out.write('</div>\n')
+
+
+def write_day_tile(out: HTMLWriter, day: Dict[str, Any]):
+    """Dopisuje kafelek podsumowania jednego z kolejnych dni"""
+    out.write(f'<div style="{STYLE_FORECAST_TILE}">')
+    out.element('div', STYLE_FORECAST_TIME, f"{day['weekday']} {day['date']}")
+    out.element('div', STYLE_FORECAST_ICON, WEATHER_ICONS.get(day.get('icon', ''), DEFAULT_WEATHER_ICON))
+    out.element('div', STYLE_FORECAST_DESCRIPTION, day['description'])
+    out.element('div', STYLE_FORECAST_TEMP, f"{day['min_temp']}° / {day['max_temp']}°C")
+    if day.get('rain_probability', 0) > 0:
+        out.element('div', STYLE_FORECAST_RAIN, f"💧 {day['rain_probability']}%")
+    out.write('</div>\n')
+
+
+def write_article_card(out: HTMLWriter, article: Dict[str, Any]):
+    """Dopisuje kartę artykułu z listy lektur"""
+    out.write(f'<div style="{STYLE_CARD}">')
+    if article['link']:
+        out.write(f'<div style="{STYLE_ARTICLE_TITLE}">')
+        out.element('a', STYLE_ARTICLE_LINK, article['name'], href=article['link'])
+        out.write('</div>')
+    else:
+        out.element('div', STYLE_ARTICLE_TITLE, article['name'])
+    if article['author']:
+        out.element('div', STYLE_ARTICLE_AUTHOR, 'Autor: ', article['author'])
+    out.write('</div>\n')
+
+
+def render_events_section(events: List[Dict[str, Any]]) -> str:
+    """Generuje HTML dla sekcji wydarzeń"""
+    if not events:
+        return render_empty_section('Brak zaplanowanych wydarzeń na dziś.')
+    
+    out = HTMLWriter()
+    for event in events:
+        write_event_card(out, event)
+    return out.getvalue()
+
+
+def render_weather_section(weather: Dict[str, Any]) -> str:
+    """Generuje HTML dla sekcji pogody z prognozą na cały dzień"""
+    if not weather or not weather.get('forecasts'):
+        return render_empty_section('Brak danych pogodowych.')
+    
+    summary = weather.get('summary', {})
+    
+    # Nagłówek z podsumowaniem
+    out = HTMLWriter()
+    out.write(f'<div style="{STYLE_PANEL}">', f'<div style="{STYLE_WEATHER_HEADER}"><div>')
+    out.element('div', STYLE_WEATHER_CITY, '📍 ', weather.get('city', 'Nieznane miasto'))
+    out.element('div', STYLE_WEATHER_SUMMARY,
+                f"{summary.get('min_temp', 'N/A')}°C - {summary.get('max_temp', 'N/A')}°C | "
+                f"Wilgotność: {summary.get('avg_humidity', 'N/A')}%")
+    out.write('</div></div>\n')
+    
+    # Prognoza godzinowa jako poziomy pasek kafelków
+    out.write(f'<div style="{STYLE_FORECAST_ROW}">\n')
+    for forecast in weather['forecasts']:
+        write_forecast_tile(out, forecast)
+    out.write('</div>\n')
+    
+    # Podsumowania kolejnych dni (WEATHER_WEEK_AHEAD)
+    if weather.get('days'):
+        out.element('div', STYLE_WEEK_TITLE, 'Najbliższe dni')
+        out.write(f'<div style="{STYLE_FORECAST_ROW}">\n')
+        for day in weather['days']:
+            write_day_tile(out, day)
+        out.write('</div>\n')
+    out.write('</div>')
+    return out.getvalue()
+
+
+def render_articles_section(articles: List[Dict[str, Any]]) -> str:
+    """Generuje HTML dla sekcji artykułów"""
+    if not articles:
+        return render_empty_section('Brak nowych artykułów do przeczytania.')
+    
+    out = HTMLWriter()
+    for article in articles:
+        write_article_card(out, article)
+    return out.getvalue()
+
+
+def render_quote_section(quote: Dict[str, str]) -> str:
+    """Generuje HTML dla sekcji cytatu"""
+    if not quote:
+        return render_empty_section('Brak cytatu na dziś.')
+    
+    out = HTMLWriter()
+    out.write(f'<div style="{STYLE_QUOTE_PANEL}">')
+    out.element('div', STYLE_QUOTE_TEXT, '"', quote.get('quote', 'Brak cytatu'), '"')
+    out.element('div', STYLE_QUOTE_AUTHOR, '— ', quote.get('author', 'Nieznany autor'))
+    if quote.get('source'):
+        out.element('div', STYLE_QUOTE_SOURCE, quote['source'])
+    out.write('</div>')
+    return out.getvalue()
+
+
+def render_errors_section(errors: List[str]) -> str:
+    """Generuje HTML dla sekcji błędów"""
+    if not errors:
+        return ''
+    
+    out = HTMLWriter()
+    out.write(f'<div style="{STYLE_ERRORS_PANEL}">')
+    out.element('h3', STYLE_ERRORS_TITLE, '⚠️ Uwagi systemowe')
+    for error in errors:
+        out.element('div', STYLE_ERROR_LINE, '• ', error)
+    out.write('</div>')
+    return out.getvalue()
+
+
+HTML_COMMENT_PATTERN = re.compile(r'<!--.*?-->', re.S)
+STYLE_ATTRIBUTE_PATTERN = re.compile(r' style="([^"]*)"')
+
+
+def compact_html(document: str) -> str:
+    """Zmniejsza HTML e-maila: usuwa komentarze i wcięcia, a powtarzające się style inline przenosi do klas"""
+    document = HTML_COMMENT_PATTERN.sub('', document)
+    document = re.sub(r'\n\s+', '\n', document)
+    
+    counts = Counter(STYLE_ATTRIBUTE_PATTERN.findall(document))
+    repeated = [style for style, count in counts.most_common() if count > 1]
+    if not repeated:
+        return document
+    classes = {style: f'ds{i}' for i, style in enumerate(repeated)}
+    
+    # Sekcje generowane przez komponenty mają tylko atrybut style (bez class), więc można go podmienić wprost
+    document = STYLE_ATTRIBUTE_PATTERN.sub(
+        lambda m: f' class="{classes[m.group(1)]}"' if m.group(1) in classes else m.group(0), document
+    )
+    style_block = '<style>\n' + '\n'.join(f'.{name}{{{style}}}' for style, name in classes.items()) + '\n</style>\n'
+    if '</head>' in document:
+        return document.replace('</head>', style_block + '</head>', 1)
+    return style_block + document
+
+
+def render_plain_text(content: Dict[str, Any]) -> str:
+    """Generuje tekstową wersję digestu (część text/plain wiadomości)"""
+    lines = [f"Dzienny Digest - {datetime.now().strftime('%d.%m.%Y')}", '',
+             content.get('ai_intro') or 'Oto Twoje podsumowanie na dziś!', '']
+    
+    lines.append('WYDARZENIA')
+    for event in content.get('events') or []:
+        line = f"- {event['time']} {event['title']}"
+        if event.get('location'):
+            line += f" ({event['location']})"
+        if event.get('calendar_name') and event['calendar_name'] != 'primary':
+            line += f" [{event['calendar_name']}]"
+        lines.append(line)
+    if not content.get('events'):
+        lines.append('Brak zaplanowanych wydarzeń na dziś.')
+    lines.append('')
+    
+    weather = content.get('weather') or {}
+    lines.append('PROGNOZA')
+    if weather.get('forecasts'):
+        summary = weather.get('summary', {})
+        lines.append(f"{weather.get('city', 'Nieznane miasto')}: {summary.get('min_temp', 'N/A')}°C - "
+                     f"{summary.get('max_temp', 'N/A')}°C, wilgotność {summary.get('avg_humidity', 'N/A')}%")
+        for forecast in weather['forecasts']:
+            line = f"- {forecast['time']}: {forecast['temperature']}°C, {forecast['description']}"
+            if forecast.get('rain_probability', 0) > 0:
+                line += f", opady {forecast['rain_probability']}%"
+            lines.append(line)
+        for day in weather.get('days', []):
+            lines.append(f"- {day['weekday']} {day['date']}: {day['min_temp']}°C - {day['max_temp']}°C, "
+                         f"{day['description']}")
+    else:
+        lines.append('Brak danych pogodowych.')
+    lines.append('')
+    
+    lines.append('ARTYKUŁY')
+    for article in content.get('articles') or []:
+        line = f"- {article['name']}"
+        if article.get('author'):
+            line += f" ({article['author']})"
+        if article.get('link'):
+            line += f": {article['link']}"
+        lines.append(line)
+    if not content.get('articles'):
+        lines.append('Brak nowych artykułów do przeczytania.')
+    lines.append('')
+    
+    quote = content.get('quote') or {}
+    lines.append('CYTAT DNIA')
+    if quote:
+        lines.append(f"\"{quote.get('quote', 'Brak cytatu')}\" — {quote.get('author', 'Nieznany autor')}")
+        if quote.get('source'):
+            lines.append(quote['source'])
+    else:
+        lines.append('Brak cytatu na dziś.')
+    
+    if content.get('errors'):
+        lines.extend(['', 'UWAGI SYSTEMOWE'])
+        lines.extend(f"- {error}" for error in content['errors'])
+    
+    return '\n'.join(lines) + '\n'
+
+
+def benchmark_render(sizes: Iterable[int] = (10, 100, 1000), repeats: int = 20) -> List[Dict[str, float]]:
+    """Mierzy czas renderowania sekcji dla syntetycznych danych o rosnącej liczbie elementów"""
+    results = []
+    for size in sizes:
+        events = [{'time': f'{i % 24:02d}:00', 'title': f'Wydarzenie {i}', 'location': 'Biuro',
+                   'calendar_name': 'Praca'} for i in range(size)]
+        weather = {'city': 'Warszawa', 'summary': {'min_temp': 3, 'max_temp': 12, 'avg_humidity': 70},
+                   'forecasts': [{'time': f'{i % 24:02d}:00', 'icon': '10d', 'description': 'lekki deszcz',
+                                  'temperature': 8, 'feels_like': 6, 'rain_probability': 40,
+                                  'wind_speed': 3.5} for i in range(size)]}
+        articles = [{'name': f'Artykuł {i}', 'link': f'https://example.com/{i}', 'author': 'Autor'}
+                    for i in range(size)]
+        errors = [f'Błąd {i}' for i in range(size)]
+        
+        start = time.perf_counter()
+        for _ in range(repeats):
+            render_events_section(events)
+            render_weather_section(weather)
+            render_articles_section(articles)
+            render_errors_section(errors)
+        elapsed = (time.perf_counter() - start) / repeats
+        results.append({'size': size, 'ms': elapsed * 1000, 'us_per_item': elapsed * 1e6 / (4 * size)})
+    return results
+
+
+class CompiledTemplate:
+    """Szablon HTML sparsowany raz do listy fragmentów i nazw placeholderów {{NAZWA}}.
+
+    Renderowanie to jedno przejście: podstawienie wartości w miejsca placeholderów i `''.join`.
+    """
+    
+    PLACEHOLDER_PATTERN = re.compile(r'{{\s*([A-Z0-9_]+)\s*}}')
+    
+    def __init__(self, source: str):
+        # Parzyste indeksy to stały tekst, nieparzyste - nazwy placeholderów
+        self.segments = self.PLACEHOLDER_PATTERN.split(source)
+        self.placeholders = frozenset(self.segments[1::2])
+    
+    def render(self, values: Dict[str, Any], escape: Iterable[str] = ()) -> str:
+        """Renderuje szablon; wartości z `escape` są kodowane jako tekst HTML, brakujące zostają puste"""
+        escape = set(escape)
+        parts = list(self.segments)
+        for i in range(1, len(parts), 2):
+            name = parts[i]
+            value = values.get(name, '')
+            value = '' if value is None else str(value)
+            parts[i] = html.escape(value) if name in escape else value
+        return ''.join(parts)
+
+
+_compiled_templates: Dict[str, Tuple[float, CompiledTemplate]] = {}
+_compiled_templates_lock = threading.Lock()
+
+
+def get_compiled_template(path: str) -> CompiledTemplate:
+    """Zwraca skompilowany szablon z pamięci procesu (kompilowany ponownie po zmianie pliku)"""
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    with _compiled_templates_lock:
+        cached = _compiled_templates.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, 'r', encoding='utf-8') as f:
+                cached = (mtime, CompiledTemplate(f.read()))
+            _compiled_templates[path] = cached
+            logger.info(f"Skompilowano szablon {os.path.basename(path)} ({len(cached[1].placeholders)} placeholderów)")
+        return cached[1]
+
+
 class EmailSender:
     """Zarządza wysyłaniem e-maili"""
     
-    def __init__(self):
-        self.smtp_server = "smtp.gmail.com"
-        self.smtp_port = 587
+    template_path = 'email_template.html'
+    # Pola wstawiane jako zwykły tekst (sekcje są już gotowym HTML-em)
+    escaped_fields = ('AI_INTRO', 'DATE')
+    
+    def __init__(self, recipient: Optional[str] = None):
+        self.smtp_server = SMTP_SERVER
+        self.smtp_port = SMTP_PORT
+        self.use_tls = SMTP_USE_TLS
         self.email = os.getenv('GMAIL_EMAIL')
         self.password = os.getenv('GMAIL_APP_PASSWORD')
-        self.recipient = os.getenv('RECIPIENT_EMAIL')
+        self.recipient = recipient or os.getenv('RECIPIENT_EMAIL')
     
-    def send_daily_digest(self, content: Dict[str, Any]):
-        """Wysyła dzienny digest na e-mail"""
-        try:
-            # Załaduj szablon HTML
-            template_path = 'email_template.html'
-            with open(template_path, 'r', encoding='utf-8') as f:
-                template = f.read()
+    def create_pool(self, size: int = SMTP_POOL_SIZE) -> SMTPConnectionPool:
+        """Tworzy pulę połączeń SMTP z ustawieniami tego nadawcy"""
+        return SMTPConnectionPool(self.smtp_server, self.smtp_port, self.email, self.password,
+                                  size=size, use_tls=self.use_tls)
+    
+    def build_message(self, content: Dict[str, Any]) -> MIMEMultipart:
+        """Buduje wiadomość e-mail z dziennym digestem"""
+        metrics = get_run_metrics()
+        with metrics.span('stage', stage='render'):
+            # Szablon HTML kompilowany raz na proces
+            template = get_compiled_template(self.template_path)
             
             # Wypełnij szablon danymi
             html_content = self._fill_template(template, content)
-            
-            # Utwórz wiadomość
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = f"📅 Daily Digest - {datetime.now().strftime('%d.%m.%Y')}"
-            msg['From'] = formataddr(('Daily Digest', self.email))
-            msg['To'] = self.recipient
-            
-            # Dodaj treść HTML
+            html_size = len(html_content.encode('utf-8'))
+            if EMAIL_COMPACT_HTML:
+                html_content = compact_html(html_content)
+            text_content = render_plain_text(content)
+        
+        # Utwórz wiadomość
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = f"📅 Daily Digest - {datetime.now().strftime('%d.%m.%Y')}"
+        msg['From'] = formataddr(('Daily Digest', self.email))
+        msg['To'] = self.recipient
+        
+        # Wersja tekstowa przed HTML - klienty pocztowe wybierają ostatnią obsługiwaną część
+        msg.attach(MIMEText(text_content, 'plain', 'utf-8'))
+        
+        # Dodaj treść HTML (w trybie kompaktowym quoted-printable - krótsze niż base64 dla HTML-a)
+        if EMAIL_COMPACT_HTML:
+            html_charset = email_charset.Charset('utf-8')
+            html_charset.body_encoding = email_charset.QP
+            html_part = MIMEText(html_content, 'html', html_charset)
+        else:
             html_part = MIMEText(html_content, 'html', 'utf-8')
-            msg.attach(html_part)
+        msg.attach(html_part)
+        
+        message_size = len(msg.as_bytes())
+        metrics.incr('emails_built_total')
+        metrics.incr('email_bytes_total', message_size)
+        size_info = f"HTML {html_size} B"
+        if EMAIL_COMPACT_HTML:
+            size_info += f" → {len(html_content.encode('utf-8'))} B (kompaktowy)"
+        logger.info(
+            f"Rozmiar wiadomości do {self.recipient}: {size_info}, "
+            f"tekst {len(text_content.encode('utf-8'))} B, całość {message_size} B"
+        )
+        
+        return msg
+    
+    def send_daily_digest(self, content: Dict[str, Any], pool: Optional[SMTPConnectionPool] = None):
+        """Wysyła dzienny digest na e-mail (przez pulę połączeń, jeśli została podana)"""
+        try:
+            msg = self.build_message(content)
             
             # Wyślij e-mail
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.email, self.password)
-                server.send_message(msg)
+            with get_run_metrics().span('stage', stage='smtp'):
+                if pool is not None:
+                    pool.send(msg)
+                else:
+                    with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
+                        if self.use_tls:
+                            server.starttls()
+                        if self.email and self.password:
+                            server.login(self.email, self.password)
+                        server.send_message(msg)
             
-            logger.info("E-mail został wysłany pomyślnie")
+            logger.info(f"E-mail do {self.recipient} został wysłany pomyślnie")
             
         except Exception as e:
             logger.error(f"Błąd podczas wysyłania e-maila: {e}")
             raise
     
-    def _fill_template(self, template: str, content: Dict[str, Any]) -> str:
+    def _fill_template(self, template: CompiledTemplate, content: Dict[str, Any]) -> str:
         """Wypełnia szablon HTML danymi"""
         # Generuj sekcje HTML
         events_html = self._generate_events_html(content.get('events', []))
@@ -559,178 +2972,789 @@ class EmailSender:
         errors_html = self._generate_errors_html(content.get('errors', []))
         ai_intro = content.get('ai_intro', 'Oto Twoje podsumowanie na dziś!')
         
-        # Zastąp placeholdery w szablonie
-        filled_template = template.replace('{{AI_INTRO}}', ai_intro)
-        filled_template = filled_template.replace('{{EVENTS_SECTION}}', events_html)
-        filled_template = filled_template.replace('{{WEATHER_SECTION}}', weather_html)
-        filled_template = filled_template.replace('{{ARTICLES_SECTION}}', articles_html)
-        filled_template = filled_template.replace('{{QUOTE_SECTION}}', quote_html)
-        filled_template = filled_template.replace('{{ERRORS_SECTION}}', errors_html)
-        filled_template = filled_template.replace('{{DATE}}', datetime.now().strftime('%d.%m.%Y'))
-        
-        return filled_template
+        # Wstaw wartości w miejsca placeholderów (jedno przejście po szablonie)
+        return template.render({
+            'AI_INTRO': ai_intro,
+            'EVENTS_SECTION': events_html,
+            'WEATHER_SECTION': weather_html,
+            'ARTICLES_SECTION': articles_html,
+            'QUOTE_SECTION': quote_html,
+            'ERRORS_SECTION': errors_html,
+            'DATE': datetime.now().strftime('%d.%m.%Y')
+        }, escape=self.escaped_fields)
     
     def _generate_events_html(self, events: List[Dict[str, Any]]) -> str:
         """Generuje HTML dla sekcji wydarzeń"""
-        if not events:
-            return '<p style="color: #666;">Brak zaplanowanych wydarzeń na dziś.</p>'
-        
-        html = ''
-        for event in events:
-            # Dodaj informację o kalendarzu, jeśli jest dostępna i nie jest 'primary'
-            calendar_info = ''
-            if 'calendar_name' in event and event['calendar_name'] != 'primary':
-                calendar_info = f'<div style="color: #777; font-size: 12px; margin-top: 2px;">Kalendarz: {event["calendar_name"]}</div>'
-            
-            html += f'''
-            <div style="margin-bottom: 15px; padding: 10px; background-color: #f8f9fa; border-radius: 8px;">
-                <div style="font-weight: 600; color: #007AFF;">{event['time']}</div>
-                <div style="font-weight: 500; margin-top: 5px;">{event['title']}</div>
-                {f'<div style="color: #666; font-size: 14px; margin-top: 3px;">📍 {event["location"]}</div>' if event.get('location') else ''}
-                {calendar_info}
-            </div>
-            '''
-        return html
+        return render_events_section(events)
     
     def _generate_weather_html(self, weather: Dict[str, Any]) -> str:
         """Generuje HTML dla sekcji pogody z prognozą na cały dzień"""
-        if not weather or not weather.get('forecasts'):
-            return '<p style="color: #666;">Brak danych pogodowych.</p>'
-        
-        forecasts = weather.get('forecasts', [])
-        summary = weather.get('summary', {})
-        city = weather.get('city', 'Nieznane miasto')
-        
-        # Mapowanie ikon pogodowych na emoji
-        weather_icons = {
-            '01d': '☀️', '01n': '🌙',  # clear sky
-            '02d': '⛅', '02n': '☁️',  # few clouds
-            '03d': '☁️', '03n': '☁️',  # scattered clouds
-            '04d': '☁️', '04n': '☁️',  # broken clouds
-            '09d': '🌧️', '09n': '🌧️',  # shower rain
-            '10d': '🌦️', '10n': '🌧️',  # rain
-            '11d': '⛈️', '11n': '⛈️',  # thunderstorm
-            '13d': '❄️', '13n': '❄️',  # snow
-            '50d': '🌫️', '50n': '🌫️'   # mist
-        }
-        
-        # Nagłówek z podsumowaniem
-        html = f'''
-        <div style="background-color: #f8f9fa; padding: 15px; border-radius: 8px;">
-            <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px;">
-                <div>
-                    <div style="font-size: 18px; font-weight: 600; color: #007AFF;">📍 {city}</div>
-                    <div style="font-size: 14px; color: #666; margin-top: 2px;">
-                        {summary.get('min_temp', 'N/A')}°C - {summary.get('max_temp', 'N/A')}°C | 
-                        Wilgotność: {summary.get('avg_humidity', 'N/A')}%
-                    </div>
-                </div>
-            </div>
-        '''
-        
-        # Prognoza godzinowa w stylu podobnym do obrazka
-        if forecasts:
-            html += '''
-            <div style="display: flex; overflow-x: auto; gap: 15px; padding: 10px 0;">
-            '''
-            
-            for forecast in forecasts:
-                icon = weather_icons.get(forecast.get('icon', ''), '🌤️')
-                rain_info = ''
-                if forecast.get('rain_probability', 0) > 0:
-                    rain_info = f'<div style="color: #007AFF; font-size: 11px; margin-top: 2px;">💧 {forecast["rain_probability"]}%</div>'
-                
-                html += f'''
-                <div style="
-                    min-width: 80px; 
-                    text-align: center; 
-                    background-color: white; 
-                    padding: 12px 8px; 
-                    border-radius: 8px; 
-                    border: 1px solid #e0e0e0;
-                    box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-                ">
-                    <div style="font-weight: 600; font-size: 14px; color: #333; margin-bottom: 8px;">
-                        {forecast['time']}
-                    </div>
-                    <div style="font-size: 24px; margin: 8px 0;">
-                        {icon}
-                    </div>
-                    <div style="font-size: 12px; color: #666; margin-bottom: 4px; line-height: 1.2;">
-                        {forecast['description']}
-                    </div>
-                    <div style="font-weight: 600; font-size: 16px; color: #333; margin: 6px 0;">
-                        {forecast['temperature']}°C
-                    </div>
-                    <div style="font-size: 11px; color: #999;">
-                        Odczuwalnie {forecast['feels_like']}°C
-                    </div>
-                    {rain_info}
-                    <div style="font-size: 10px; color: #999; margin-top: 4px;">
-                        💨 {forecast['wind_speed']} m/s
-                    </div>
-                </div>
-                '''
-            
-            html += '</div>'
-        
-        html += '</div>'
-        return html
+        return render_weather_section(weather)
     
     def _generate_articles_html(self, articles: List[Dict[str, Any]]) -> str:
         """Generuje HTML dla sekcji artykułów"""
-        if not articles:
-            return '<p style="color: #666;">Brak nowych artykułów do przeczytania.</p>'
-        
-        html = ''
-        for article in articles:
-            link_html = f'<a href="{article["link"]}" style="color: #007AFF; text-decoration: none;">{article["name"]}</a>' if article['link'] else article['name']
-            author_html = f'<div style="color: #666; font-size: 14px; margin-top: 3px;">Autor: {article["author"]}</div>' if article['author'] else ''
-            
-            html += f'''
-            <div style="margin-bottom: 15px; padding: 10px; background-color: #f8f9fa; border-radius: 8px;">
-                <div style="font-weight: 500;">{link_html}</div>
-                {author_html}
-            </div>
-            '''
-        return html
+        return render_articles_section(articles)
     
     def _generate_quote_html(self, quote: Dict[str, str]) -> str:
         """Generuje HTML dla sekcji cytatu"""
-        if not quote:
-            return '<p style="color: #666;">Brak cytatu na dziś.</p>'
-        
-        return f'''
-        <div style="background-color: #f8f9fa; padding: 20px; border-radius: 8px; border-left: 4px solid #007AFF;">
-            <div style="font-style: italic; font-size: 16px; margin-bottom: 10px;">
-                "{quote.get('quote', 'Brak cytatu')}"
-            </div>
-            <div style="font-weight: 500; color: #666;">
-                — {quote.get('author', 'Nieznany autor')}
-            </div>
-            {f'<div style="font-size: 14px; color: #999; margin-top: 5px;">{quote.get("source", "")}</div>' if quote.get('source') else ''}
-        </div>
-        '''
+        return render_quote_section(quote)
     
     def _generate_errors_html(self, errors: List[str]) -> str:
         """Generuje HTML dla sekcji błędów"""
-        if not errors:
-            return ''
+        return render_errors_section(errors)
+
+
+class SnapshotStore:
+    """Ostatnie poprawne wyniki źródeł (wydarzenia, pogoda, cytat) z czasem zapisu.
+
+    Kopie są trwałe (cache na dysku) i podawane, gdy źródło jest wolne lub niedostępne.
+    Wydarzenia i prognoza dotyczą konkretnego dnia, więc ich kopia z innego dnia jest pomijana - przy
+    codziennym uruchomieniu dzisiejszą kopię budują `fallbacks` z lokalnych danych integracji (pełny
+    payload prognozy w cache pogody, stan synchronizacji przyrostowej kalendarza).
+    Artykuły nie mają kopii - wysłane artykuły są oznaczane w Notion jako przeczytane, więc kopia
+    podałaby ponownie te same pozycje zamiast bieżącej listy lektur.
+    """
+    
+    SOURCE_NAMES = {'events': "Google Calendar", 'weather': "OpenWeatherMap", 'quote': "Cytat dnia"}
+    SAME_DAY_SOURCES = ('events', 'weather')
+    
+    def __init__(self, cache: DiskCache):
+        self.cache = cache
+    
+    def load(self, scope: str, source: str) -> Optional[Dict[str, Any]]:
+        """Zwraca kopię {'value', 'saved_at', 'date'} lub None"""
+        if source not in self.SOURCE_NAMES:
+            return None
+        snapshot = self.cache.get(f"{scope}:{source}")
+        if snapshot is None:
+            return None
+        if source in self.SAME_DAY_SOURCES and snapshot['date'] != datetime.now().strftime('%Y-%m-%d'):
+            return None
+        return snapshot
+    
+    def load_all(self, scope: str, sources: Iterable[str],
+                 fallbacks: Optional[Dict[str, Callable[[], Optional[Dict[str, Any]]]]] = None
+                 ) -> Dict[str, Dict[str, Any]]:
+        """Kopie dostępne dla podanych źródeł; z zapisanej kopii i kopii z `fallbacks` wybierana jest nowsza"""
+        fallbacks = fallbacks or {}
+        snapshots = {}
+        for source in sources:
+            candidates = [self.load(scope, source)]
+            if source in fallbacks:
+                try:
+                    candidates.append(fallbacks[source]())
+                except Exception as e:
+                    logger.warning(f"Nie udało się zbudować kopii {source} z danych lokalnych: {e}")
+            candidates = [snapshot for snapshot in candidates if snapshot is not None]
+            if candidates:
+                snapshots[source] = max(candidates, key=lambda snapshot: snapshot['saved_at'])
+        return snapshots
+    
+    @staticmethod
+    def make_snapshot(value: Any, saved_at: datetime) -> Dict[str, Any]:
+        """Tworzy kopię w formacie {'value', 'saved_at', 'date'}"""
+        return {
+            'value': value,
+            'saved_at': saved_at.isoformat(timespec='seconds'),
+            'date': saved_at.strftime('%Y-%m-%d')
+        }
+    
+    def save(self, scope: str, source: str, value: Any) -> None:
+        if source not in self.SOURCE_NAMES:
+            return
+        self.cache.set(f"{scope}:{source}", self.make_snapshot(value, datetime.now()))
+
+
+def get_snapshot_store() -> Optional[SnapshotStore]:
+    """Zwraca magazyn ostatnich poprawnych wyników (None, jeśli wyłączony przez DIGEST_SNAPSHOTS)"""
+    if not SNAPSHOTS_ENABLED:
+        return None
+    return SnapshotStore(get_disk_cache('snapshots', SNAPSHOT_MAX_AGE, max_entries=1000))
+
+
+def _describe_snapshot(snapshot: Dict[str, Any]) -> str:
+    """Czas zapisu kopii w formie do komunikatu dla użytkownika"""
+    saved_at = datetime.fromisoformat(snapshot['saved_at'])
+    if saved_at.date() == datetime.now().date():
+        return f"dane z {saved_at.strftime('%H:%M')}"
+    return f"dane z {saved_at.strftime('%d.%m %H:%M')}"
+
+
+def fetch_sources_concurrently(sources: Dict[str, Tuple[str, Callable[[], Any], Any]],
+                               deadline: float = FETCH_DEADLINE,
+                               snapshots: Optional[Dict[str, Dict[str, Any]]] = None,
+                               on_result: Optional[Callable[[str, Any], None]] = None
+                               ) -> Tuple[Dict[str, Any], List[str]]:
+    """Pobiera dane ze wszystkich źródeł równolegle w ramach globalnego limitu czasu.
+
+    `sources` mapuje klucz wyniku na krotkę (nazwa źródła, funkcja pobierająca, wartość domyślna).
+    Źródła, które nie zdążą przed upływem `deadline`, dostają wartość domyślną i wpis w liście błędów.
+    Źródło z kopią w `snapshots` czeka tylko SNAPSHOT_STALE_AFTER sekund (lub do błędu), po czym
+    podawana jest kopia oznaczona jako nieaktualna. `on_result` dostaje każdy świeży wynik - także ten,
+    który nadejdzie po zakończeniu oczekiwania (do odświeżenia kopii na kolejne uruchomienie).
+    """
+    results = {}
+    errors = []
+    snapshots = snapshots or {}
+
+    executor = ThreadPoolExecutor(max_workers=max(len(sources), 1), thread_name_prefix='digest-fetch')
+    futures = {key: executor.submit(func) for key, (_, func, _) in sources.items()}
+
+    start = time.monotonic()
+    if snapshots:
+        # Najpierw krótkie oczekiwanie; dłużej czekamy tylko na źródła bez kopii
+        wait(futures.values(), timeout=min(SNAPSHOT_STALE_AFTER, deadline))
+        pending = [future for key, future in futures.items() if key not in snapshots and not future.done()]
+        if pending:
+            wait(pending, timeout=max(deadline - (time.monotonic() - start), 0))
+    else:
+        wait(futures.values(), timeout=deadline)
+    elapsed = time.monotonic() - start
+
+    def _late_result(key: str, future: Future):
+        if not future.cancelled() and future.exception() is None:
+            try:
+                on_result(key, future.result())
+            except Exception as e:
+                logger.warning(f"Nie udało się zapisać spóźnionego wyniku {key}: {e}")
+
+    for key, future in futures.items():
+        name, _, default = sources[key]
+        snapshot = snapshots.get(key)
+        if not future.done():
+            if snapshot is not None:
+                error_msg = f"{name} - źródło odpowiada zbyt wolno, użyto kopii ({_describe_snapshot(snapshot)})"
+                logger.warning(error_msg)
+                errors.append(error_msg)
+                results[key] = snapshot['value']
+                if on_result is not None:
+                    future.add_done_callback(lambda f, key=key: _late_result(key, f))
+                continue
+            error_msg = f"{name} - przekroczono limit czasu {deadline:.0f}s na pobranie danych"
+            logger.error(error_msg)
+            errors.append(error_msg)
+            results[key] = default
+            continue
+
+        try:
+            results[key] = future.result()
+        except Exception as e:
+            if snapshot is not None:
+                error_msg = f"{name} - źródło niedostępne, użyto kopii ({_describe_snapshot(snapshot)})"
+                logger.warning(error_msg)
+                errors.append(error_msg)
+                results[key] = snapshot['value']
+                continue
+            results[key] = default
+            # Błąd integracji jest już na jej liście errors - nie dublujemy komunikatu
+            if not isinstance(e, SourceUnavailableError):
+                error_msg = f"{name} - błąd podczas pobierania danych: {str(e)}"
+                logger.error(error_msg)
+                errors.append(error_msg)
+            continue
+        
+        if on_result is not None:
+            on_result(key, results[key])
+
+    # Nie czekamy na wątki, które przekroczyły limit - wynik i tak zostanie pominięty
+    executor.shutdown(wait=False, cancel_futures=True)
+    logger.info(f"Pobieranie danych zakończone w {elapsed:.2f}s")
+
+    return results, errors
+
+
+def _timed_stage(metrics: RunMetrics, stage: str, func: Callable[[], Any]) -> Callable[[], Any]:
+    """Opakowuje funkcję pobierającą źródło w span etapu"""
+    def _run():
+        with metrics.span('stage', stage=stage):
+            return func()
+    return _run
+
+
+def _raise_on_integration_error(integration: 'APIIntegration', func: Callable[[], Any]) -> Callable[[], Any]:
+    """Zamienia pusty wynik po błędzie zapisanym przez integrację na wyjątek SourceUnavailableError"""
+    def _run():
+        errors_before = len(integration.errors)
+        result = func()
+        if not result and len(integration.errors) > errors_before:
+            raise SourceUnavailableError(integration.errors[-1])
+        return result
+    return _run
+
+
+def collect_digest_content(calendar: 'GoogleCalendarIntegration', weather: 'WeatherIntegration',
+                           notion: 'NotionIntegration', quotes: 'QuotesManager',
+                           ai_generator: 'AIContentGenerator', language: str = DEFAULT_LANGUAGE,
+                           weather_source: Optional[Callable[[], Dict[str, Any]]] = None,
+                           generate_intro: bool = True, snapshot_scope: Optional[str] = None,
+                           quote_source: Optional[Callable[[], Dict[str, str]]] = None) -> Dict[str, Any]:
+    """Pobiera dane ze wszystkich źródeł i przygotowuje treść e-maila.
+
+    Przy `generate_intro=False` pole `ai_intro` zostaje puste - wprowadzenie generuje później
+    wywołujący (np. zadaniem OpenAI Batch dla wielu użytkowników naraz).
+    `snapshot_scope` (np. adres odbiorcy) włącza kopie ostatnich poprawnych danych dla wolnych
+    lub niedostępnych źródeł.
+    """
+    # Zbieranie danych - wszystkie źródła pobierane równolegle
+    logger.info("Pobieranie danych...")
+    
+    metrics = get_run_metrics()
+    sources = {
+        'events': ("Google Calendar", _raise_on_integration_error(calendar, calendar.get_today_events), []),
+        'weather': ("OpenWeatherMap", _raise_on_integration_error(weather, weather_source or weather.get_weather_forecast), {}),
+        'articles': ("Notion", _raise_on_integration_error(notion, notion.get_articles_not_started), []),
+    }
+    # W trybie łączonym cytat powstaje w tym samym zapytaniu do AI co wprowadzenie
+    if not AI_COMBINED_MODE or not generate_intro:
+        sources['quote'] = ("Cytat dnia", quote_source or quotes.get_random_quote, {})
+    sources = {key: (name, _timed_stage(metrics, key, func), default) for key, (name, func, default) in sources.items()}
+    
+    snapshot_store = get_snapshot_store() if snapshot_scope else None
+    snapshots, on_result = None, None
+    if snapshot_store is not None:
+        # Zapisana kopia wydarzeń i pogody jest ważna tylko w dniu zapisu - dzisiejszą budujemy z danych lokalnych
+        snapshots = snapshot_store.load_all(snapshot_scope, sources, fallbacks={
+            'events': calendar.get_synced_snapshot,
+            'weather': weather.get_cached_snapshot
+        })
+        
+        def on_result(key: str, value: Any):
+            if value:
+                snapshot_store.save(snapshot_scope, key, value)
+    
+    fetched, fetch_errors = fetch_sources_concurrently(sources, snapshots=snapshots, on_result=on_result)
+    
+    events = fetched['events']
+    logger.info(f"Pobrano {len(events)} wydarzeń z kalendarza")
+    
+    weather_data = fetched['weather']
+    # Zaktualizowane logowanie dla nowej struktury danych pogodowych
+    if weather_data and weather_data.get('forecasts'):
+        forecasts_count = len(weather_data.get('forecasts', []))
+        city = weather_data.get('city', 'nieznane miasto')
+        logger.info(f"Pobrano prognozę pogody dla {city}: {forecasts_count} prognoz na dziś")
+    else:
+        logger.info("Pobrano dane pogodowe: brak danych")
+    
+    articles = fetched['articles']
+    logger.info(f"Pobrano {len(articles)} artykułów z Notion")
+    
+    quote = fetched.get('quote', {})
+    if quote:
+        logger.info(f"Wylosowano cytat: {quote.get('author', 'Nieznany')}")
+    
+    # Zbieranie wszystkich błędów
+    all_errors = []
+    all_errors.extend(fetch_errors)
+    all_errors.extend(calendar.errors)
+    all_errors.extend(weather.errors)
+    all_errors.extend(notion.errors)
+    
+    # Przygotowanie danych dla AI
+    ai_data = {
+        'events': events,
+        'weather': weather_data,
+        'articles': articles,
+        'quote': quote,
+        'language': language
+    }
+    
+    # Generowanie spersonalizowanej treści
+    ai_intro = None
+    if generate_intro:
+        logger.info("Generowanie spersonalizowanej treści...")
+        intro_start = time.monotonic()
+        if AI_COMBINED_MODE:
+            try:
+                ai_intro, quote = ai_generator.generate_intro_and_quote(ai_data)
+            except Exception as e:
+                # Awaryjnie: cytat z puli i osobne zapytanie o wprowadzenie
+                logger.warning(f"Tryb łączony AI nie powiódł się, używam osobnych zapytań: {e}")
+                quote = (quote_source or quotes.get_random_quote)()
+                ai_data['quote'] = quote
+        
+        if ai_intro is None:
+            ai_intro = ai_generator.generate_personalized_content(ai_data)
+        metrics.record_span('stage', time.monotonic() - intro_start, stage='ai_intro')
+    
+    # Przygotowanie danych do wysłania
+    return {
+        'ai_intro': ai_intro,
+        'events': events,
+        'weather': weather_data,
+        'articles': articles,
+        'quote': quote,
+        'language': language,
+        'errors': all_errors
+    }
+
+
+class SharedResultCache:
+    """Współdzielone wyniki pobrań w obrębie jednego uruchomienia (np. pogoda dla tego samego miasta).
+
+    Pierwszy wątek, który poprosi o dany klucz, wykonuje pobranie - pozostałe czekają na jego wynik.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures: Dict[Any, Future] = {}
+    
+    def get_or_compute(self, key: Any, compute_func: Callable[[], Any]) -> Any:
+        """Zwraca wynik dla klucza, obliczając go tylko raz"""
+        with self._lock:
+            future = self._futures.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._futures[key] = future
+        
+        if is_owner:
+            try:
+                future.set_result(compute_func())
+            except Exception as e:
+                future.set_exception(e)
+        
+        return future.result()
+
+
+def load_recipients(path: str) -> List[Dict[str, Any]]:
+    """Wczytuje listę odbiorców trybu wsadowego z pliku JSON"""
+    with open(path, 'r', encoding='utf-8') as f:
+        recipients = json.load(f)
+    
+    if not isinstance(recipients, list):
+        raise DailyDigestError(f"Plik {path} powinien zawierać listę odbiorców")
+    if not recipients:
+        raise DailyDigestError(f"Plik {path} nie zawiera żadnego odbiorcy")
+    
+    for index, recipient in enumerate(recipients, start=1):
+        if not recipient.get('email'):
+            raise DailyDigestError(f"Odbiorca #{index} w pliku {path} nie ma adresu e-mail")
+        # ID kalendarzy można podać jako listę lub jako string rozdzielony przecinkami
+        calendar_ids = recipient.get('calendar_ids') or []
+        if isinstance(calendar_ids, str):
+            calendar_ids = [cal_id.strip() for cal_id in calendar_ids.split(',')]
+        # Wszyscy odbiorcy korzystają z tokenu operatora (token.json), więc 'primary' i GOOGLE_CALENDAR_IDS
+        # oznaczałyby prywatny kalendarz operatora - dozwolone są tylko jawne ID udostępnionych kalendarzy
+        calendar_ids = [cal_id.strip() for cal_id in calendar_ids if cal_id.strip()]
+        if 'primary' in calendar_ids:
+            raise DailyDigestError(
+                f"Odbiorca {recipient['email']} w pliku {path}: kalendarz 'primary' jest niedozwolony w trybie "
+                f"wsadowym - podaj ID kalendarza udostępnionego kontu Google operatora (np. adres e-mail odbiorcy)"
+            )
+        recipient['calendar_ids'] = calendar_ids
+        if recipient.get('send_time'):
+            parse_send_time(recipient['send_time'])
+    
+    return recipients
+
+
+def parse_send_time(value: str) -> Tuple[int, int]:
+    """Parsuje godzinę wysyłki w formacie HH:MM"""
+    match = re.fullmatch(r'(\d{1,2}):(\d{2})', value.strip())
+    if not match or int(match.group(1)) > 23 or int(match.group(2)) > 59:
+        raise DailyDigestError(f"Niepoprawna godzina wysyłki '{value}' (oczekiwano HH:MM)")
+    return int(match.group(1)), int(match.group(2))
+
+
+def prepare_recipient_content(recipient: Dict[str, Any], google_credentials, shared_results: SharedResultCache,
+                              generate_intro: bool = True) -> Dict[str, Any]:
+    """Pobiera dane i przygotowuje treść digestu dla jednego odbiorcy (tryb wsadowy i demon)"""
+    language = recipient.get('language', DEFAULT_LANGUAGE)
+    calendar = GoogleCalendarIntegration(recipient.get('calendar_ids'), credentials=google_credentials)
+    weather = WeatherIntegration(recipient.get('city'), language)
+    notion = NotionIntegration(recipient.get('notion_database_id'))
+    
+    def _shared_weather() -> Dict[str, Any]:
+        # Prognoza dla tego samego miasta i języka pobierana jest raz na całe uruchomienie
+        data, errors = shared_results.get_or_compute(
+            ('weather', weather.city.lower(), weather.language),
+            lambda: (weather.get_weather_forecast(), list(weather.errors))
+        )
+        weather.errors[:] = errors
+        return data
+    
+    quotes = QuotesManager()
+    
+    def _shared_quote() -> Dict[str, str]:
+        # Cytat dnia jest jeden na całe uruchomienie - pula traci jeden cytat, a nie jeden na odbiorcę
+        return shared_results.get_or_compute('quote', quotes.get_random_quote)
+    
+    return collect_digest_content(
+        calendar, weather, notion, quotes, AIContentGenerator(),
+        language=language, weather_source=_shared_weather, generate_intro=generate_intro,
+        snapshot_scope=recipient['email'], quote_source=_shared_quote
+    )
+
+
+def run_batch(recipients_path: str, workers: int = BATCH_WORKERS) -> bool:
+    """Generuje i wysyła digest dla wszystkich odbiorców z pliku, równolegle w ograniczonej puli wątków"""
+    recipients = load_recipients(recipients_path)
+    logger.info(f"=== Tryb wsadowy: {len(recipients)} odbiorców, {workers} wątków ===")
+    
+    # Autoryzacja Google tylko raz - poświadczenia są współdzielone przez wszystkich odbiorców
+    google_credentials = GoogleCalendarIntegration().credentials
+    shared_results = SharedResultCache()
+    # Jedna pula uwierzytelnionych połączeń SMTP dla całej wysyłki
+    smtp_pool = EmailSender().create_pool()
+    
+    def _prepare_recipient(recipient: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            # Przy OpenAI Batch API wprowadzenia powstają później, jednym zadaniem dla wszystkich
+            return prepare_recipient_content(recipient, google_credentials, shared_results,
+                                             generate_intro=not AI_BATCH_API)
+        except Exception as e:
+            logger.error(f"Nie udało się przygotować digestu dla {recipient['email']}: {e}")
+            return None
+    
+    def _send_recipient(recipient: Dict[str, Any], content: Optional[Dict[str, Any]]) -> bool:
+        if content is None:
+            return False
+        try:
+            EmailSender(recipient['email']).send_daily_digest(content, pool=smtp_pool)
+        except Exception as e:
+            logger.error(f"Nie udało się wysłać digestu do {recipient['email']}: {e}")
+            return False
+        # Artykuły znikają z listy lektur dopiero wtedy, gdy digest z nimi został wysłany
+        NotionIntegration(recipient.get('notion_database_id')).mark_articles_done(content['articles'])
+        return True
+    
+    with smtp_pool, ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='digest-user') as executor:
+        contents = list(executor.map(_prepare_recipient, recipients))
+        
+        if AI_BATCH_API:
+            prepared = {str(index): content for index, content in enumerate(contents) if content is not None}
+            intros = OpenAIBatchPipeline(AIContentGenerator()).run({
+                custom_id: {key: content[key] for key in ('events', 'weather', 'articles', 'quote', 'language')}
+                for custom_id, content in prepared.items()
+            })
+            for custom_id, content in prepared.items():
+                content['ai_intro'] = intros.get(custom_id, AI_FALLBACK_INTRO)
+        
+        results = list(executor.map(_send_recipient, recipients, contents))
+    
+    # Wydany cytat zapisujemy raz, po wysyłce - bez wysłanego digestu zostaje w puli
+    if any(results):
+        get_quote_pool().flush()
+    
+    smtp_stats = smtp_pool.stats()
+    logger.info(
+        f"SMTP: {smtp_stats['messages_sent']} wiadomości, {smtp_stats['connections_opened']} połączeń, "
+        f"{smtp_stats['reconnects']} ponownych połączeń, {smtp_stats['messages_per_second']} wiad./s"
+    )
+    
+    get_http_session().log_stats()
+    log_cache_stats()
+    finish_run_metrics(success=all(results))
+    
+    sent = sum(results)
+    logger.info(f"=== Tryb wsadowy zakończony: wysłano {sent}/{len(recipients)} digestów ===")
+    return sent == len(recipients)
+
+
+class DigestDaemon:
+    """Proces działający w tle, który przygotowuje digesty przed godziną wysyłki.
+
+    Klienci HTTP/AI i cache pozostają "ciepłe" między dniami. Dla każdej godziny wysyłki (pole
+    `send_time` odbiorcy lub DIGEST_SEND_TIME) dane są pobierane i wiadomości renderowane
+    DIGEST_LEAD_MINUTES wcześniej, DIGEST_REFRESH_SECONDS przed wysyłką odświeżany jest kalendarz,
+    a gotowe wiadomości wychodzą przez pulę SMTP dokładnie o czasie.
+    """
+    
+    def __init__(self, recipients: List[Dict[str, Any]], workers: int = BATCH_WORKERS,
+                 lead_minutes: float = DAEMON_LEAD_MINUTES, refresh_seconds: float = DAEMON_REFRESH_SECONDS):
+        self.recipients = recipients
+        self.workers = max(workers, 1)
+        self.lead = timedelta(minutes=lead_minutes)
+        self.refresh = timedelta(seconds=refresh_seconds)
+        self.stop_event = threading.Event()
+    
+    def next_slot(self, now: datetime) -> Tuple[datetime, List[Dict[str, Any]]]:
+        """Najbliższa godzina wysyłki i odbiorcy, którzy mają ją otrzymać"""
+        groups: Dict[datetime, List[Dict[str, Any]]] = {}
+        for recipient in self.recipients:
+            hour, minute = parse_send_time(recipient.get('send_time') or DEFAULT_SEND_TIME)
+            send_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if send_at <= now:
+                send_at += timedelta(days=1)
+            groups.setdefault(send_at, []).append(recipient)
+        send_at = min(groups)
+        return send_at, groups[send_at]
+    
+    def _sleep_until(self, moment: datetime) -> bool:
+        """Czeka do podanej chwili; zwraca False, jeśli demon został zatrzymany"""
+        while not self.stop_event.is_set():
+            remaining = (moment - datetime.now()).total_seconds()
+            if remaining <= 0:
+                return True
+            # Krótkie odcinki - odporność na uśpienie systemu i zmiany zegara
+            self.stop_event.wait(min(remaining, 60))
+        return False
+    
+    def _prepare(self, recipients: List[Dict[str, Any]], executor: ThreadPoolExecutor) -> Dict[str, Dict[str, Any]]:
+        """Pobiera dane i renderuje wiadomości dla grupy odbiorców"""
+        # Ponowna autoryzacja odświeża token Google, jeśli wygasł od poprzedniego dnia
+        google_credentials = GoogleCalendarIntegration().credentials
+        shared_results = SharedResultCache()
+        
+        def _prepare_one(recipient: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            try:
+                content = prepare_recipient_content(recipient, google_credentials, shared_results)
+                sender = EmailSender(recipient['email'])
+                return {'recipient': recipient, 'content': content, 'sender': sender,
+                        'message': sender.build_message(content), 'credentials': google_credentials}
+            except Exception as e:
+                logger.error(f"Nie udało się przygotować digestu dla {recipient['email']}: {e}")
+                return None
         
-        html = '''
-        <div style="background-color: #fff3cd; border: 1px solid #ffeaa7; padding: 15px; border-radius: 8px; margin-top: 20px;">
-            <h3 style="margin: 0 0 10px 0; color: #856404;">⚠️ Uwagi systemowe</h3>
-        '''
+        prepared = {}
+        for recipient, item in zip(recipients, executor.map(_prepare_one, recipients)):
+            if item is not None:
+                prepared[recipient['email']] = item
+        return prepared
+    
+    def _refresh_calendar(self, prepared: Dict[str, Dict[str, Any]], executor: ThreadPoolExecutor) -> int:
+        """Odświeża wydarzenia tuż przed wysyłką i renderuje ponownie zmienione wiadomości"""
+        def _refresh_one(item: Dict[str, Any]) -> bool:
+            calendar = GoogleCalendarIntegration(item['recipient'].get('calendar_ids'),
+                                                 credentials=item['credentials'])
+            events = calendar.get_today_events()
+            if calendar.errors or events == item['content']['events']:
+                return False
+            item['content']['events'] = events
+            item['message'] = item['sender'].build_message(item['content'])
+            return True
         
-        for error in errors:
-            html += f'<div style="color: #856404; font-size: 14px; margin-bottom: 5px;">• {error}</div>'
+        changed = 0
+        for email, future in {email: executor.submit(_refresh_one, item) for email, item in prepared.items()}.items():
+            try:
+                changed += future.result()
+            except Exception as e:
+                logger.warning(f"Nie udało się odświeżyć kalendarza dla {email}: {e}")
+        return changed
+    
+    def _send(self, prepared: Dict[str, Dict[str, Any]], executor: ThreadPoolExecutor, send_at: datetime) -> int:
+        """Wysyła gotowe wiadomości przez wspólną pulę połączeń SMTP"""
+        def _send_one(item: Dict[str, Any]) -> bool:
+            try:
+                with get_run_metrics().span('stage', stage='smtp'):
+                    pool.send(item['message'])
+            except Exception as e:
+                logger.error(f"Nie udało się wysłać digestu do {item['recipient']['email']}: {e}")
+                return False
+            # Przygotowanie nie zmienia niczego w Notion - artykuły oznaczamy dopiero po wysyłce
+            notion = NotionIntegration(item['recipient'].get('notion_database_id'))
+            notion.mark_articles_done(item['content']['articles'])
+            return True
         
-        html += '</div>'
-        return html
+        with EmailSender().create_pool() as pool:
+            sent = sum(executor.map(_send_one, prepared.values()))
+        delay = (datetime.now() - send_at).total_seconds()
+        logger.info(f"Demon: wysłano {sent}/{len(prepared)} digestów zaplanowanych na "
+                    f"{send_at.strftime('%H:%M')} (zakończono {delay:.1f}s po czasie)")
+        return sent
+    
+    def run_cycle(self, send_at: datetime, recipients: List[Dict[str, Any]]) -> int:
+        """Jeden cykl: przygotowanie, odświeżenie kalendarza i wysyłka o `send_at`.
+
+        Przygotowanie nie ma trwałych efektów ubocznych (statusy w Notion, zapis puli cytatów) - te
+        następują dopiero po wysyłce, więc zatrzymanie demona przed wysyłką niczego nie gubi.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='digest-daemon') as executor:
+            start = time.monotonic()
+            prepared = self._prepare(recipients, executor)
+            logger.info(f"Demon: przygotowano {len(prepared)}/{len(recipients)} digestów "
+                        f"w {time.monotonic() - start:.1f}s")
+            
+            if not self._sleep_until(send_at - self.refresh):
+                logger.info(f"Demon: zatrzymano przed wysyłką - {len(prepared)} przygotowanych digestów porzucono")
+                return 0
+            changed = self._refresh_calendar(prepared, executor)
+            if changed:
+                logger.info(f"Demon: zmiany w kalendarzu u {changed} odbiorców - wiadomości odświeżone")
+            
+            if not self._sleep_until(send_at):
+                logger.info(f"Demon: zatrzymano przed wysyłką - {len(prepared)} przygotowanych digestów porzucono")
+                return 0
+            sent = self._send(prepared, executor, send_at)
+            if sent:
+                get_quote_pool().flush()
+            return sent
+    
+    def run_forever(self):
+        """Pętla główna demona (do sygnału SIGINT/SIGTERM)"""
+        logger.info(f"=== Tryb demona: {len(self.recipients)} odbiorców, przygotowanie "
+                    f"{self.lead.total_seconds() / 60:g} min przed wysyłką ===")
+        while not self.stop_event.is_set():
+            send_at, recipients = self.next_slot(datetime.now())
+            logger.info(f"Demon: następna wysyłka {send_at.strftime('%d.%m %H:%M')} ({len(recipients)} odbiorców)")
+            # Przygotowanie nie zaczyna się przed północą dnia wysyłki - "dziś" musi oznaczać dzień wysyłki
+            prepare_at = max(send_at - self.lead, send_at.replace(hour=0, minute=0))
+            if not self._sleep_until(prepare_at):
+                break
+            # Każdy cykl ma własny zestaw metryk (eksport nadpisuje plik wynikiem ostatniej wysyłki)
+            reset_run_metrics()
+            success = False
+            try:
+                success = self.run_cycle(send_at, recipients) == len(recipients)
+            except Exception as e:
+                logger.error(f"Demon: błąd cyklu wysyłki {send_at.strftime('%H:%M')}: {e}")
+            get_http_session().log_stats()
+            log_cache_stats()
+            finish_run_metrics(success)
+            # Cykl zakończony przed czasem (np. zatrzymanie) - nie planujemy tej samej godziny ponownie
+            self._sleep_until(send_at + timedelta(seconds=1))
+        logger.info("=== Tryb demona zakończony ===")
+    
+    def stop(self, *_):
+        self.stop_event.set()
+
+
+def run_daemon(recipients_path: Optional[str], workers: int = BATCH_WORKERS) -> None:
+    """Uruchamia demona dla odbiorców z pliku (lub jednego odbiorcy z konfiguracji .env)"""
+    if recipients_path and os.path.exists(recipients_path):
+        recipients = load_recipients(recipients_path)
+    else:
+        recipient_email = os.getenv('RECIPIENT_EMAIL')
+        if not recipient_email:
+            raise DailyDigestError("Brak pliku odbiorców i zmiennej RECIPIENT_EMAIL dla trybu demona")
+        recipients = [{'email': recipient_email}]
+    
+    daemon = DigestDaemon(recipients, workers)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    daemon.run_forever()
+
+
+def log_cache_stats() -> None:
+    """Loguje liczniki trafień wszystkich używanych cache"""
+    with _disk_caches_lock:
+        caches = dict(_disk_caches)
+    for name, cache in caches.items():
+        cache_stats = cache.stats()
+        logger.info(f"Cache {name}: {cache_stats['hits']} trafień, {cache_stats['misses']} chybień")
+    
+    completion_cache = get_completion_cache()
+    if completion_cache is not None and AI_CACHE_BACKEND != 'disk':
+        cache_stats = completion_cache.stats()
+        logger.info(
+            f"Cache odpowiedzi AI: {cache_stats['hits']} trafień, {cache_stats['misses']} chybień "
+            f"(skuteczność {cache_stats['hit_rate']:.0%})"
+        )
+
+
+def _measure_imports(module: str) -> Tuple[List[Tuple[str, float]], List[Tuple[str, float]]]:
+    """Importuje moduły w nowym interpreterze z -X importtime.
+
+    Zwraca (importy najwyższego poziomu, bezpośrednie zależności ostatniego z nich) jako listy (nazwa, ms).
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise DailyDigestError(f"Pomiar importów nie powiódł się: {result.stderr.strip().splitlines()[-1:]}")
+    
+    top_level, children, pending_children = [], [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|', 2)
+        if not cumulative.strip().isdigit():
+            continue  # nagłówek tabeli
+        # Wcięcie nazwy to poziom zagnieżdżenia; zależności są wypisywane przed modułem, który je importuje
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entry = (name.strip(), int(cumulative) / 1000)
+        if depth == 0:
+            top_level.append(entry)
+            children, pending_children = pending_children, []
+        elif depth == 1:
+            pending_children.append(entry)
+    return top_level, children
+
+
+def startup_report(top: int = 10) -> List[str]:
+    """Raport czasu startu: import skryptu oraz koszt bibliotek ładowanych leniwie"""
+    script_imports, script_children = _measure_imports('daily_digest')
+    script_total = dict(script_imports).get('daily_digest', 0.0)
+    lazy_imports, _ = _measure_imports(', '.join(LAZY_IMPORTS))
+    lazy_imports = [(name, ms) for name, ms in lazy_imports if name in LAZY_IMPORTS]
+    
+    lines = [f"Import daily_digest: {script_total:.1f} ms", "Najwolniejsze zależności przy starcie:"]
+    for name, ms in sorted(script_children, key=lambda item: item[1], reverse=True)[:top]:
+        lines.append(f"  {ms:8.1f} ms  {name}")
+    lines.append(f"Biblioteki ładowane dopiero przy użyciu (pominięte przy starcie): "
+                 f"{sum(ms for _, ms in lazy_imports):.1f} ms")
+    for name, ms in sorted(lazy_imports, key=lambda item: item[1], reverse=True):
+        lines.append(f"  {ms:8.1f} ms  {name}")
+    return lines
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parsuje argumenty linii poleceń"""
+    parser = argparse.ArgumentParser(description="Daily Digest - codzienne podsumowanie dnia")
+    parser.add_argument(
+        '--batch', nargs='?', metavar='PLIK',
+        const=os.getenv('DIGEST_RECIPIENTS_FILE', 'recipients.json'),
+        help="tryb wsadowy: wysyła digest do wszystkich odbiorców z pliku JSON"
+    )
+    parser.add_argument(
+        '--daemon', nargs='?', metavar='PLIK', const=os.getenv('DIGEST_RECIPIENTS_FILE', 'recipients.json'),
+        help="tryb demona: przygotowuje digesty przed godziną wysyłki i wysyła je o czasie"
+    )
+    parser.add_argument(
+        '--workers', type=int, default=BATCH_WORKERS,
+        help="liczba odbiorców przetwarzanych równolegle w trybie wsadowym"
+    )
+    parser.add_argument(
+        '--refill-quotes', action='store_true',
+        help="uzupełnia pulę cytatów partią wygenerowaną przez AI (np. z osobnego zadania cron)"
+    )
+    parser.add_argument(
+        '--startup-report', action='store_true',
+        help="mierzy czas importu skryptu (-X importtime) i koszt bibliotek ładowanych leniwie"
+    )
+    parser.add_argument(
+        '--benchmark-render', action='store_true',
+        help="mierzy czas renderowania sekcji e-maila dla rosnącej liczby elementów"
+    )
+    return parser.parse_args(argv)
 
 
 def main():
     """Główna funkcja skryptu"""
+    args = parse_args()
+    if args.startup_report:
+        print('\n'.join(startup_report()))
+        sys.exit(0)
+    
+    if args.benchmark_render:
+        for result in benchmark_render():
+            print(f"{result['size']:>6} elementów/sekcję: {result['ms']:8.2f} ms "
+                  f"({result['us_per_item']:.2f} µs/element)")
+        sys.exit(0)
+    
+    if args.refill_quotes:
+        added = QuotesManager().refill_pool()
+        sys.exit(0 if added > 0 else 1)
+    
+    if args.daemon:
+        try:
+            run_daemon(args.daemon, args.workers)
+        except Exception as e:
+            logger.error(f"Krytyczny błąd w trybie demona: {e}")
+            sys.exit(1)
+        sys.exit(0)
+    
+    if args.batch:
+        try:
+            success = run_batch(args.batch, args.workers)
+        except Exception as e:
+            logger.error(f"Krytyczny błąd w trybie wsadowym: {e}")
+            finish_run_metrics(success=False)
+            success = False
+        sys.exit(0 if success else 1)
+    
     logger.info("=== Rozpoczynam generowanie daily digest ===")
     
     try:
@@ -742,59 +3766,19 @@ def main():
         ai_generator = AIContentGenerator()
         email_sender = EmailSender()
         
-        # Zbieranie danych
-        logger.info("Pobieranie danych...")
-        
-        events = calendar.get_today_events()
-        logger.info(f"Pobrano {len(events)} wydarzeń z kalendarza")
-        
-        weather_data = weather.get_weather_forecast()
-        # Zaktualizowane logowanie dla nowej struktury danych pogodowych
-        if weather_data and weather_data.get('forecasts'):
-            forecasts_count = len(weather_data.get('forecasts', []))
-            city = weather_data.get('city', 'nieznane miasto')
-            logger.info(f"Pobrano prognozę pogody dla {city}: {forecasts_count} prognoz na dziś")
-        else:
-            logger.info("Pobrano dane pogodowe: brak danych")
-        
-        articles = notion.get_articles_not_started()
-        logger.info(f"Pobrano {len(articles)} artykułów z Notion")
-        
-        quote = quotes.get_random_quote()
-        logger.info(f"Wylosowano cytat: {quote.get('author', 'Nieznany')}")
-        
-        # Zbieranie wszystkich błędów
-        all_errors = []
-        all_errors.extend(calendar.errors)
-        all_errors.extend(weather.errors)
-        all_errors.extend(notion.errors)
-        
-        # Przygotowanie danych dla AI
-        ai_data = {
-            'events': events,
-            'weather': weather_data,
-            'articles': articles,
-            'quote': quote
-        }
-        
-        # Generowanie spersonalizowanej treści
-        logger.info("Generowanie spersonalizowanej treści...")
-        ai_intro = ai_generator.generate_personalized_content(ai_data)
-        
-        # Przygotowanie danych do wysłania
-        email_content = {
-            'ai_intro': ai_intro,
-            'events': events,
-            'weather': weather_data,
-            'articles': articles,
-            'quote': quote,
-            'errors': all_errors
-        }
+        email_content = collect_digest_content(calendar, weather, notion, quotes, ai_generator,
+                                               snapshot_scope=email_sender.recipient)
         
         # Wysłanie e-maila
         logger.info("Wysyłanie e-maila...")
         email_sender.send_daily_digest(email_content)
+        # Efekty uboczne dopiero po wysyłce: artykuły oznaczone jako przeczytane, wydany cytat zapisany
+        notion.mark_articles_done(email_content['articles'])
+        quotes.pool.flush()
         
+        get_http_session().log_stats()
+        log_cache_stats()
+        finish_run_metrics(success=True)
         logger.info("=== Daily digest zakończony sukcesem ===")
         
     except Exception as e:
@@ -812,11 +3796,21 @@ def main():
             }
             
             email_sender = EmailSender()
+            # Zamiast pustych sekcji - ostatnie poprawne dane, jeśli są
+            snapshot_store = get_snapshot_store()
+            if snapshot_store is not None and email_sender.recipient:
+                snapshots = snapshot_store.load_all(email_sender.recipient, SnapshotStore.SOURCE_NAMES)
+                for source, snapshot in snapshots.items():
+                    error_content[source] = snapshot['value']
+                    error_content['errors'].append(
+                        f"{SnapshotStore.SOURCE_NAMES[source]} - użyto kopii ({_describe_snapshot(snapshot)})"
+                    )
             email_sender.send_daily_digest(error_content)
             
         except Exception as email_error:
             logger.error(f"Nie udało się wysłać e-maila z błędem: {email_error}")
         
+        finish_run_metrics(success=False)
         sys.exit(1)
 
 
@@ -214,6 +214,100 @@ def test_weather_api():
         print(f"❌ Błąd połączenia z OpenWeatherMap: {e}")
         return False
 
+def test_snapshots():
+    """Testuje (offline), czy dane zapisane poprzedniego dnia dają kopię wydarzeń i pogody na dziś"""
+    print("\n🗂️ Testowanie kopii danych z poprzedniego dnia...")
+    
+    try:
+        import json
+        import tempfile
+        from datetime import datetime, timedelta
+        from google.oauth2.credentials import Credentials
+        import daily_digest as dd
+        
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        yesterday = today - timedelta(days=1)
+        
+        def store_yesterday(cache, key, value):
+            # Wpis zapisany wczoraj o 7:45 (jak przy codziennym uruchomieniu z cron)
+            cache.set(key, value)
+            with open(cache._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            entry['stored_at'] = (yesterday + timedelta(hours=7, minutes=45)).timestamp()
+            with open(cache._path(key), 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+        
+        def event(title, day, hour):
+            start = day + timedelta(hours=hour)
+            return {
+                'id': title,
+                'summary': title,
+                'start': {'dateTime': start.strftime('%Y-%m-%dT%H:%M:%SZ')},
+                'end': {'dateTime': (start + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%SZ')}
+            }
+        
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # Kopie digestu z wczoraj - same w sobie pomijane, bo dotyczą innego dnia
+            snapshots = dd.SnapshotStore(dd.DiskCache(os.path.join(cache_dir, 'snapshots'), 7 * 86400))
+            saved_at = yesterday + timedelta(hours=7, minutes=45)
+            snapshots.cache.set('test:weather', snapshots.make_snapshot({'city': 'Wczoraj', 'forecasts': []}, saved_at))
+            snapshots.cache.set('test:events',
+                                snapshots.make_snapshot([{'time': '09:00', 'title': 'Wczoraj'}], saved_at))
+            
+            # Pełny 5-dniowy payload prognozy pobrany wczoraj (TTL cache pogody już minął)
+            weather = dd.WeatherIntegration('Warsaw')
+            weather.cache = dd.DiskCache(os.path.join(cache_dir, 'weather'), 3 * 3600)
+            first_slot = int((yesterday + timedelta(hours=9)).timestamp())
+            store_yesterday(weather.cache, weather._cache_key(), {
+                'city': {'name': 'Warsaw'},
+                'list': [{
+                    'dt': first_slot + i * 10800,
+                    'main': {'temp': 10 + i % 8, 'feels_like': 9, 'humidity': 70, 'pressure': 1012},
+                    'wind': {'speed': 3.0},
+                    'weather': [{'description': 'zachmurzenie', 'icon': '04d'}],
+                    'pop': 0.1
+                } for i in range(40)]
+            })
+            
+            # Stan synchronizacji przyrostowej kalendarza z wczoraj (okno 7 dni)
+            calendar = dd.GoogleCalendarIntegration(['zespol@example.com'], credentials=Credentials(token='offline'))
+            calendar.sync_store = dd.DiskCache(os.path.join(cache_dir, 'calendar_sync'), 7 * 86400)
+            calendar.metadata_cache = dd.DiskCache(os.path.join(cache_dir, 'calendar'), 7 * 86400)
+            events = [event('Wczoraj', yesterday, 9), event('Dzisiaj', today, 10),
+                      event('Jutro', today + timedelta(days=1), 9)]
+            store_yesterday(calendar.sync_store, 'sync:zespol@example.com', {
+                'sync_token': 'token',
+                'horizon': (yesterday + timedelta(days=7)).isoformat(),
+                'events': {item['id']: item for item in events}
+            })
+            
+            result = snapshots.load_all('test', ['events', 'weather'], fallbacks={
+                'events': calendar.get_synced_snapshot,
+                'weather': weather.get_cached_snapshot
+            })
+        
+        forecast_hours = [int(forecast['time'][:2]) for forecast in result['weather']['value']['forecasts']]
+        checks = [
+            (result['weather']['value']['city'] == 'Warsaw', "pogoda nie pochodzi z payloadu prognozy"),
+            # 8 przedziałów 3-godzinnych (7 lub 9 w dniu zmiany czasu), bez przedziałów z innych dni
+            (7 <= len(forecast_hours) <= 9 and forecast_hours == sorted(forecast_hours),
+             "prognoza nie obejmuje dzisiejszego dnia"),
+            ([item['title'] for item in result['events']['value']] == ['Dzisiaj'],
+             "wydarzenia spoza dzisiejszego dnia"),
+            (result['events']['date'] == yesterday.strftime('%Y-%m-%d'), "kopia nie ma daty zapisu z wczoraj")
+        ]
+        failed = [message for ok, message in checks if not ok]
+        if failed:
+            print(f"❌ Kopia danych z poprzedniego dnia: {', '.join(failed)}")
+            return False
+        
+        print("✅ Kopia z poprzedniego dnia daje dzisiejszą pogodę i wydarzenia")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Błąd podczas testowania kopii danych: {e}")
+        return False
+
 def main():
     """Główna funkcja testowa"""
     print("🧪 === DAILY DIGEST TEST SUITE ===\n")
@@ -224,7 +318,8 @@ def main():
         ("Cytaty", test_quotes),
         ("Zależności Python", test_imports),
         ("OpenAI API", test_openai_connection),
-        ("Weather API", test_weather_api)
+        ("Weather API", test_weather_api),
+        ("Kopie danych", test_snapshots)
     ]
     
     results = []